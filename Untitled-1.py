@@ -1,7 +1,8 @@
-﻿import os
+﻿import asyncio
+import os
 import random
 from pathlib import Path
-from typing import Optional, Union
+from typing import Awaitable, BinaryIO, Callable, Optional, Union
 
 from telegram import (
     CallbackQuery,
@@ -10,12 +11,12 @@ from telegram import (
     InputMediaPhoto,
     InputMediaVideo,
     Message,
-    ReplyKeyboardMarkup,
     Update,
 )
 from telegram.error import BadRequest, TimedOut
 from telegram.constants import ParseMode
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CallbackQueryHandler,
     CommandHandler,
@@ -26,63 +27,54 @@ from telegram.ext import (
 
 # Import our new modules
 import database
+import db_async
+import catalogue_reload
 import cocktails_data as data
+import media
+import metrics
+import prewarm_videos
+import search
+from render import build_render_cache, cocktail_caption, get_render_cache, page_keyboard, paginate, parse_page
+from rate_limiter import TokenBucketRateLimiter
+from search import build_name_index, find_cocktail_slug, find_similar_cocktails, search_by_ingredient
+from update_processor import PerChatUpdateProcessor
 
 # --- Configuration ---
 # Задайте токен и путь к обложке при необходимости.
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
 COCKTAIL_IMAGE_PATH = Path("cocktail.jpg")
-# Все видео храним в папке video рядом с этим файлом
-VIDEOS_DIR = Path(__file__).parent / "video"
-
-NAME_TO_SLUG: dict[str, str] = {}
-
-
-def _normalize_name(text: str) -> str:
-    return text.strip().lower()
-
-
-def _register_name(name: str, slug: str) -> None:
-    if not name:
-        return
-    NAME_TO_SLUG.setdefault(_normalize_name(name), slug)
-
-
-def build_name_index() -> None:
-    """Строит индекс имен/синонимов коктейлей для поиска по вводу."""
-    NAME_TO_SLUG.clear()
-    for slug, label in data.ALCOHOLIC_COCKTAILS + data.NON_ALCOHOLIC_COCKTAILS:
-        _register_name(label, slug)
-        _register_name(slug.replace("_", " "), slug)
-    for slug, details in data.COCKTAIL_DETAILS.items():
-        _register_name(details.get("title", ""), slug)
-    # Быстрые клавиатурные варианты
-    _register_name("1", " ")
-
-
-def find_cocktail_slug(user_input: str) -> Optional[str]:
-    """Ищет слаг по названию."""
-    if not user_input:
-        return None
-    if not NAME_TO_SLUG:
-        build_name_index()
-    return NAME_TO_SLUG.get(_normalize_name(user_input))
-
-
-def search_by_ingredient(query: str) -> list[tuple[str, str]]:
-    """Ищет коктейли, содержащие ингредиент. Возвращает список (slug, title)."""
-    query = query.lower()
-    results = []
-    for slug, details in data.COCKTAIL_DETAILS.items():
-        ingredients = details.get("ingredients", [])
-        # Проверяем каждый ингредиент
-        for ing in ingredients:
-            if query in ing.lower():
-                results.append((slug, details["title"]))
-                break
-    return results
-
-
+# Ключ file_id обложки в кэше медиа (видео там хранятся по слагу или хэшу файла)
+COVER_MEDIA_KEY = f"photo:{COCKTAIL_IMAGE_PATH.name}"
+# Чат (например, приватный канал бота), куда при старте заранее загружаются
+# видео без file_id. Пусто — прогрев выключен.
+VIDEO_WARMUP_CHAT_ID = os.environ.get("VIDEO_WARMUP_CHAT_ID", "")
+# Адрес Bot API; переопределяется для локальной заглушки в бенчмарках
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+# Режим получения апдейтов: "polling" (по умолчанию) или "webhook".
+# Для webhook Telegram шлёт апдейты на WEBHOOK_URL, бот слушает WEBHOOK_LISTEN:WEBHOOK_PORT
+# и принимает только запросы с заголовком X-Telegram-Bot-Api-Secret-Token = WEBHOOK_SECRET.
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Локальный эндпоинт метрик в формате Prometheus: METRICS_PORT=9100 (0 — выключен)
+METRICS_PORT = metrics.METRICS_PORT
+
+# Сколько апдейтов обрабатывать одновременно (апдейты одного чата всё равно идут
+# по очереди). 1 — последовательная обработка, как раньше.
+MAX_CONCURRENT_UPDATES = int(os.environ.get("MAX_CONCURRENT_UPDATES", "32"))
+
+# Результаты поиска по ингредиентам листаются кнопками; для этого последние
+# SEARCH_RESULTS_KEPT выдач пользователя хранятся в user_data по id сообщения
+SEARCH_RESULTS_KEPT = 5
+
+
+@metrics.instrument
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Приветствует пользователя и показывает первую клавиатуру."""
     if update.message is None:
@@ -90,6 +82,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await send_main_menu(update.message)
 
 
+@metrics.instrument
 async def handle_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обрабатывает текстовые ответы пользователя."""
     if not update.message:
@@ -135,18 +128,38 @@ async def handle_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             slug, _ = found[0]
             await send_cocktail_message(update.message, slug, data.COCKTAIL_DETAILS[slug], user_id)
         else:
-            # Нашли несколько — предлагаем выбор
-            buttons = [
-                InlineKeyboardButton(text=title, callback_data=f"{data.ALCOHOL_PREFIX}:{slug}") 
-                for slug, title in found[:10] # Ограничим до 10 для красоты
-            ]
+            # Нашли несколько — предлагаем выбор, по странице за раз
+            text = f"Нашел несколько коктейлей с «{answer}»:"
+            sent = await update.message.reply_text(text, reply_markup=search_page_keyboard(found, 0))
+            remember_search(context, sent.message_id, text, found)
+        return
+
+    # 3. Похожие названия (опечатки, латиница вместо кириллицы)
+    similar = find_similar_cocktails(answer)
+    if similar:
+        best_slug, best_score = similar[0]
+        runner_up = similar[1][1] if len(similar) > 1 else 0.0
+        confident = best_score >= search.FUZZY_ACCEPT_SCORE and best_score - runner_up >= 0.1
+        if confident and best_slug in data.COCKTAIL_DETAILS:
+            await send_cocktail_message(update.message, best_slug, data.COCKTAIL_DETAILS[best_slug], user_id)
+            return
+        buttons = []
+        for slug, _ in similar:
+            if slug not in data.COCKTAIL_DETAILS:
+                continue
+            prefix = data.NON_ALCOHOL_PREFIX if slug in data.NON_ALCOHOLIC_SLUGS else data.ALCOHOL_PREFIX
+            buttons.append(
+                InlineKeyboardButton(text=data.COCKTAIL_DETAILS[slug]["title"], callback_data=f"{prefix}:{slug}")
+            )
+        if buttons:
             keyboard = InlineKeyboardMarkup.from_column(buttons)
-            await update.message.reply_text(f"Нашел несколько коктейлей с «{answer}»:", reply_markup=keyboard)
-    else:
-        await update.message.reply_text(
-            "Не нашёл коктейль ни по названию, ни по ингредиентам. \n"
-            "Попробуйте нажать кнопки меню или ввести другое название (например, 'Негрони' или 'вермут')."
-        )
+            await update.message.reply_text("Возможно, вы имели в виду:", reply_markup=keyboard)
+            return
+
+    await update.message.reply_text(
+        "Не нашёл коктейль ни по названию, ни по ингредиентам. \n"
+        "Попробуйте нажать кнопки меню или ввести другое название (например, 'Негрони' или 'вермут')."
+    )
 
 
 async def send_main_menu(message: Message | None) -> None:
@@ -155,18 +168,53 @@ async def send_main_menu(message: Message | None) -> None:
         return
 
     text = "Какой коктейль сегодня хотите?"
-    keyboard = ReplyKeyboardMarkup(data.CHOICES, one_time_keyboard=True, resize_keyboard=True)
+    keyboard = get_render_cache().main_menu
 
-    if COCKTAIL_IMAGE_PATH.exists():
+    sent = None
+    if has_cover_photo():
         try:
-            with COCKTAIL_IMAGE_PATH.open("rb") as image_file:
-                await message.reply_photo(photo=image_file, caption=text, reply_markup=keyboard)
-        except TimedOut:
-            await message.reply_text(text, reply_markup=keyboard)
-    else:
+            sent = await send_cover_photo(
+                lambda photo: message.reply_photo(photo=photo, caption=text, reply_markup=keyboard)
+            )
+        except (BadRequest, TimedOut):
+            pass
+    if sent is None:
         await message.reply_text(text, reply_markup=keyboard)
 
 
+def has_cover_photo() -> bool:
+    """Есть ли обложка: уже загруженная в Telegram или файл на диске."""
+    return database.get_media_file_id(COVER_MEDIA_KEY) is not None or COCKTAIL_IMAGE_PATH.exists()
+
+
+async def send_cover_photo(send: Callable[[Union[str, BinaryIO]], Awaitable[object]]) -> object:
+    """
+    Отправляет обложку через send: по сохранённому file_id, а если его нет или
+    Telegram его отверг — загружает файл один раз и запоминает новый file_id.
+    Другие BadRequest (например, «message can't be edited») пробрасываются, file_id
+    остаётся; «message is not modified» считается доставкой.
+    Возвращает None, если отправить нечего: file_id отвергнут, а файла нет.
+    """
+    file_id = await db_async.get_media_file_id(COVER_MEDIA_KEY)
+    if file_id:
+        try:
+            return await send(file_id)
+        except BadRequest as e:
+            if media.message_not_modified(e):
+                return True
+            if not media.file_id_rejected(e):
+                raise
+            await db_async.delete_media_file_id(COVER_MEDIA_KEY)
+
+    if not COCKTAIL_IMAGE_PATH.exists():
+        return None
+    with COCKTAIL_IMAGE_PATH.open("rb") as image_file:
+        sent = await send(image_file)
+    if isinstance(sent, Message) and sent.photo:
+        await db_async.save_media_file_id(COVER_MEDIA_KEY, sent.photo[-1].file_id)
+    return sent
+
+
 async def edit_query_with_text_or_photo(
     query: CallbackQuery,
     text: str,
@@ -180,42 +228,41 @@ async def edit_query_with_text_or_photo(
     except BadRequest:
         pass
 
-    if COCKTAIL_IMAGE_PATH.exists():
-        with COCKTAIL_IMAGE_PATH.open("rb") as image_file:
-            await query.edit_message_media(
-                media=InputMediaPhoto(image_file, caption=text, parse_mode=parse_mode),
-                reply_markup=keyboard,
-            )
-    else:
+    if has_cover_photo():
         try:
-            await query.message.delete()
+            sent = await send_cover_photo(
+                lambda photo: query.edit_message_media(
+                    media=InputMediaPhoto(photo, caption=text, parse_mode=parse_mode),
+                    reply_markup=keyboard,
+                )
+            )
         except BadRequest:
-            pass
-        await query.message.chat.send_message(text, reply_markup=keyboard, parse_mode=parse_mode)
+            sent = None
+        if sent is not None:
+            return
+    try:
+        await query.message.delete()
+    except BadRequest:
+        pass
+    await query.message.chat.send_message(text, reply_markup=keyboard, parse_mode=parse_mode)
 
 
-async def send_alcohol_inline_keyboard(message: Message | None = None, query: CallbackQuery | None = None) -> None:
-    """Отправляет или обновляет инлайн-клавиатуру с коктейлями."""
-    buttons = [
-        InlineKeyboardButton(text=label, callback_data=f"{data.ALCOHOL_PREFIX}:{slug}")
-        for slug, label in data.ALCOHOLIC_COCKTAILS
-    ]
-    buttons.append(InlineKeyboardButton("← Назад", callback_data=data.MENU_BACK_CALLBACK))
-    keyboard = InlineKeyboardMarkup.from_column(buttons)
+async def send_alcohol_inline_keyboard(
+    message: Message | None = None, query: CallbackQuery | None = None, page: int = 0
+) -> None:
+    """Отправляет или обновляет инлайн-клавиатуру с коктейлями (страницу page)."""
+    keyboard = get_render_cache().list_page(data.ALCOHOL_PREFIX, page)
     if query:
         await edit_query_with_text_or_photo(query, "Выберите коктейль:", keyboard)
     elif message:
         await message.reply_text("Выберите коктейль:", reply_markup=keyboard)
 
 
-async def send_nonalcohol_inline_keyboard(message: Message | None = None, query: CallbackQuery | None = None) -> None:
-    """Отправляет или обновляет инлайн-клавиатуру безалкогольных коктейлей."""
-    buttons = [
-        InlineKeyboardButton(text=label, callback_data=f"{data.NON_ALCOHOL_PREFIX}:{slug}")
-        for slug, label in data.NON_ALCOHOLIC_COCKTAILS
-    ]
-    buttons.append(InlineKeyboardButton("← Назад", callback_data=data.MENU_BACK_CALLBACK))
-    keyboard = InlineKeyboardMarkup.from_column(buttons)
+async def send_nonalcohol_inline_keyboard(
+    message: Message | None = None, query: CallbackQuery | None = None, page: int = 0
+) -> None:
+    """Отправляет или обновляет инлайн-клавиатуру безалкогольных коктейлей (страницу page)."""
+    keyboard = get_render_cache().list_page(data.NON_ALCOHOL_PREFIX, page)
     if query:
         await edit_query_with_text_or_photo(query, "Выберите безалкогольный коктейль:", keyboard)
     elif message:
@@ -226,24 +273,28 @@ async def send_favorites_list(
     message: Message | None = None,
     query: CallbackQuery | None = None,
     user_id: Optional[int] = None,
+    page: int = 0,
 ) -> None:
-    """Показывает избранные коктейли списком кнопок."""
+    """Показывает избранные коктейли списком кнопок, по странице за раз."""
     if user_id is None:
          # Should not happen typically
          return
 
     # Get favorites from DB
-    user_favs = database.get_user_favorites(user_id)
-    favorites = [
-        slug for slug in user_favs if slug in data.COCKTAIL_DETAILS
-    ]
-    
+    user_favs = await db_async.get_user_favorites(user_id)
+    # В порядке каталога, чтобы страницы не перемешивались между запросами
+    order = get_render_cache().order
+    favorites = sorted(
+        (slug for slug in user_favs if slug in data.COCKTAIL_DETAILS),
+        key=lambda slug: order.get(slug, len(order)),
+    )
+
+    shown, page, pages = paginate(favorites, page)
     buttons = [
         InlineKeyboardButton(data.COCKTAIL_DETAILS[slug]["title"], callback_data=f"{data.FAV_LIST_PREFIX}:{slug}")
-        for slug in favorites
+        for slug in shown
     ]
-    buttons.append(InlineKeyboardButton("← Назад", callback_data=data.MENU_BACK_CALLBACK))
-    keyboard = InlineKeyboardMarkup.from_column(buttons)
+    keyboard = page_keyboard(buttons, data.FAV_LIST_PREFIX, page, pages)
 
     text = "Избранные коктейли:" if favorites else "Избранных коктейлей пока нет."
     if query:
@@ -252,6 +303,55 @@ async def send_favorites_list(
         await message.reply_text(text, reply_markup=keyboard)
 
 
+def search_page_keyboard(found: list[tuple[str, str]], page: int) -> InlineKeyboardMarkup:
+    """Страница результатов поиска; рецепт открывается из своего раздела."""
+    shown, page, pages = paginate(found, page)
+    buttons = []
+    for slug, title in shown:
+        prefix = data.NON_ALCOHOL_PREFIX if slug in data.NON_ALCOHOLIC_SLUGS else data.ALCOHOL_PREFIX
+        buttons.append(InlineKeyboardButton(text=title, callback_data=f"{prefix}:{slug}"))
+    return page_keyboard(buttons, data.SEARCH_PREFIX, page, pages)
+
+
+def remember_search(
+    context: ContextTypes.DEFAULT_TYPE, message_id: int, text: str, found: list[tuple[str, str]]
+) -> None:
+    """Запоминает выдачу для листания; старые выдачи пользователя забываются."""
+    if context.user_data is None:
+        return
+    results = context.user_data.setdefault("search_results", {})
+    results[message_id] = (text, found)
+    while len(results) > SEARCH_RESULTS_KEPT:
+        del results[next(iter(results))]
+
+
+async def send_search_page(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, page: int) -> None:
+    """Листает результаты поиска в том же сообщении."""
+    if not query.message:
+        return
+    saved = (context.user_data or {}).get("search_results", {}).get(query.message.message_id)
+    if saved is None:
+        await query.edit_message_text("Результаты поиска устарели — напишите запрос ещё раз.")
+        return
+    text, found = saved
+    await query.edit_message_text(text, reply_markup=search_page_keyboard(found, page))
+
+
+async def send_list_page(
+    query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, prefix: str, page: int, user_id: Optional[int]
+) -> None:
+    """Показывает страницу page списка, к которому относится prefix."""
+    if prefix == data.ALCOHOL_PREFIX:
+        await send_alcohol_inline_keyboard(query=query, page=page)
+    elif prefix == data.NON_ALCOHOL_PREFIX:
+        await send_nonalcohol_inline_keyboard(query=query, page=page)
+    elif prefix == data.FAV_LIST_PREFIX:
+        await send_favorites_list(query=query, user_id=user_id, page=page)
+    elif prefix == data.SEARCH_PREFIX:
+        await send_search_page(query, context, page)
+
+
+@metrics.instrument
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Реагирует на нажатия инлайн-кнопок."""
     query = update.callback_query
@@ -269,10 +369,15 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await send_main_menu(query.message)
         return
 
+    page = parse_page(slug)
+    if page is not None:
+        await send_list_page(query, context, prefix, page, user_id)
+        return
+
     if prefix == data.FAV_ADD_PREFIX:
         # Toggle Favorite via DB
         if user_id is not None:
-             is_now_fav = database.toggle_favorite(user_id, slug)
+             is_now_fav = await db_async.toggle_favorite(user_id, slug)
              msg = "Добавлено в избранное" if is_now_fav else "Удалено из избранного"
              await query.answer(msg, show_alert=False)
         else:
@@ -283,13 +388,8 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await query.answer("Мы пока не знаем этот коктейль", show_alert=True)
             return
 
-        # Determine where to go back
-        if slug in data.ALCOHOLIC_SLUGS:
-            back_callback = data.BACK_CALLBACK_ALC
-        elif slug in data.NON_ALCOHOLIC_SLUGS:
-            back_callback = data.BACK_CALLBACK_NA
-        else:
-            back_callback = data.BACK_CALLBACK_FAV
+        # Determine where to go back: the list page the cocktail is on
+        back_callback = get_render_cache().list_back_callback(slug, data.BACK_CALLBACK_FAV)
         
         await send_cocktail_response(query, slug, details, back_callback, user_id)
         return
@@ -324,46 +424,10 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text("Мы пока не знаем этот коктейль 😅")
         return
 
+    back_callback = get_render_cache().list_back_callback(slug, back_callback)
     await send_cocktail_response(query, slug, details, back_callback, user_id)
 
 
-def format_cocktail_details(details: dict) -> str:
-    """Собирает красивое описание коктейля."""
-    parts = [
-        f"🍸 <b>{details['title']}</b>",
-        "",
-        "<b>Ингредиенты:</b>",
-        *[f"• {item}" for item in details["ingredients"]],
-        "",
-        f"<b>Метод:</b>\n{details['method']}",
-    ]
-    if details.get("garnish"):
-        parts.extend(["", f"<b>Украшение:</b>\n{details['garnish']}"])
-    if details.get("note"):
-        parts.extend(["", f"<b>Заметка:</b>\n{details['note']}"])
-
-    return "\n".join(parts).strip()
-
-
-def resolve_video_source(slug: str) -> Optional[Union[str, Path]]:
-    """Находит источник видео: локальный файл или URL."""
-    value = data.COCKTAIL_VIDEOS.get(slug)
-    if value is None:
-        return None
-
-    # URL — отдать как есть
-    if isinstance(value, str) and value.startswith(("http://", "https://")):
-        return value
-
-    # Локальный файл: ищем в папке /video рядом с проектом (или используем абсолютный путь)
-    if isinstance(value, Path):
-        candidate = value if value.is_absolute() else VIDEOS_DIR / value
-    else:
-        candidate = VIDEOS_DIR / str(value)
-
-    return candidate if candidate.exists() else None
-
-
 async def send_cocktail_response(
     query: CallbackQuery, slug: str, details: dict, back_callback_data: str, user_id: Optional[int]
 ) -> None:
@@ -372,171 +436,139 @@ async def send_cocktail_response(
         return
 
     # Check DB
-    is_fav = database.is_favorite(user_id, slug) if user_id else False
-    fav_text = "✅ В избранном" if is_fav else "⭐ Добавить в избранное"
-    
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton(fav_text, callback_data=f"{data.FAV_ADD_PREFIX}:{slug}")],
-        [InlineKeyboardButton("← Назад", callback_data=back_callback_data)],
-    ])
-    caption = format_cocktail_details(details)
-
-    # Try cached file_id first for instant delivery
-    cached_file_id = database.get_video_file_id(slug)
-    if cached_file_id:
-        try:
-            await query.edit_message_media(
-                media=InputMediaVideo(
-                    media=cached_file_id,
-                    caption=caption,
-                    parse_mode=ParseMode.HTML,
-                ),
-                reply_markup=keyboard,
-            )
-            return
-        except (BadRequest, TimedOut):
-            # Cache invalid or timeout, continue to re-upload
-            pass
+    is_fav = await db_async.is_favorite(user_id, slug) if user_id else False
+    keyboard = get_render_cache().recipe_keyboard(slug, is_fav, back_callback_data)
+    caption = cocktail_caption(slug, details)
 
-    video_source = resolve_video_source(slug)
-
-    if video_source:
-        # Retry logic for timeouts
-        max_retries = 2
-        for attempt in range(max_retries + 1):
-            try:
-                if isinstance(video_source, Path):
-                    with video_source.open("rb") as file_obj:
-                        result = await query.edit_message_media(
-                            media=InputMediaVideo(
-                                media=file_obj,
-                                caption=caption,
-                                parse_mode=ParseMode.HTML,
-                            ),
-                            reply_markup=keyboard,
-                        )
-                        # Cache the file_id for future instant delivery
-                        if result and result.video:
-                            database.save_video_file_id(slug, result.video.file_id)
-                else:
-                    result = await query.edit_message_media(
-                        media=InputMediaVideo(
-                            media=video_source,
-                            caption=caption,
-                            parse_mode=ParseMode.HTML,
-                        ),
-                        reply_markup=keyboard,
-                    )
-                    # Cache the file_id for future instant delivery
-                    if result and result.video:
-                        database.save_video_file_id(slug, result.video.file_id)
-                return  # Success, exit
-            except TimedOut:
-                if attempt < max_retries:
-                    continue  # Retry
-                # All retries failed, fallback to text
-                await edit_query_with_text_or_photo(query, caption, keyboard, parse_mode=ParseMode.HTML)
-                return
-    else:
+    async def send_video(video: Union[str, BinaryIO], **attributes) -> Union[Message, bool]:
+        return await query.edit_message_media(
+            media=InputMediaVideo(media=video, caption=caption, parse_mode=ParseMode.HTML, **attributes),
+            reply_markup=keyboard,
+        )
+
+    async def send_text(video_failed: bool) -> None:
         await edit_query_with_text_or_photo(query, caption, keyboard, parse_mode=ParseMode.HTML)
 
+    await media.deliver_video(slug, send_video, send_text)
+
 
 async def send_cocktail_message(
     message: Message, slug: str, details: dict, user_id: Optional[int]
 ) -> None:
     """Отправляет рецепт (и видео, если есть) в ответ на текстовый ввод."""
-    
-    is_fav = database.is_favorite(user_id, slug) if user_id else False
-    fav_text = "✅ В избранном" if is_fav else "⭐ Добавить в избранное"
-
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton(fav_text, callback_data=f"{data.FAV_ADD_PREFIX}:{slug}")],
-        [InlineKeyboardButton("← Назад", callback_data=data.MENU_BACK_CALLBACK)],
-    ])
-    caption = format_cocktail_details(details)
-
-    # Try cached file_id first for instant delivery
-    cached_file_id = database.get_video_file_id(slug)
-    if cached_file_id:
-        try:
-            await message.reply_video(
-                video=cached_file_id,
-                caption=caption,
-                parse_mode=ParseMode.HTML,
-                reply_markup=keyboard
-            )
-            return
-        except (BadRequest, TimedOut):
-            # Cache invalid or timeout, continue to re-upload
-            pass
+    is_fav = await db_async.is_favorite(user_id, slug) if user_id else False
+    keyboard = get_render_cache().recipe_keyboard(slug, is_fav, data.MENU_BACK_CALLBACK)
+    caption = cocktail_caption(slug, details)
+
+    async def send_video(video: Union[str, BinaryIO], **attributes) -> Message:
+        return await message.reply_video(
+            video=video,
+            caption=caption,
+            parse_mode=ParseMode.HTML,
+            reply_markup=keyboard,
+            **attributes,
+        )
 
-    video_source = resolve_video_source(slug)
-
-    if video_source:
-        # Retry logic for timeouts
-        max_retries = 2
-        for attempt in range(max_retries + 1):
-            try:
-                if isinstance(video_source, Path):
-                    with video_source.open("rb") as file_obj:
-                        sent = await message.reply_video(
-                            video=file_obj,
-                            caption=caption,
-                            parse_mode=ParseMode.HTML,
-                            reply_markup=keyboard
-                        )
-                        # Cache the file_id for future instant delivery
-                        if sent and sent.video:
-                            database.save_video_file_id(slug, sent.video.file_id)
-                else:
-                    sent = await message.reply_video(
-                        video=video_source,
-                        caption=caption,
-                        parse_mode=ParseMode.HTML,
-                        reply_markup=keyboard
-                    )
-                    # Cache the file_id for future instant delivery
-                    if sent and sent.video:
-                        database.save_video_file_id(slug, sent.video.file_id)
-                return  # Success, exit
-            except TimedOut:
-                if attempt < max_retries:
-                    continue  # Retry
-                # All retries failed, fallback to text
-                await message.reply_text(
-                    text=caption + "\n\n⚠️ Видео временно недоступно",
-                    parse_mode=ParseMode.HTML,
-                    disable_web_page_preview=True,
-                    reply_markup=keyboard,
-                )
-                return
-    else:
+    async def send_text(video_failed: bool) -> None:
         await message.reply_text(
-            text=caption,
+            text=caption + ("\n\n⚠️ Видео временно недоступно" if video_failed else ""),
             parse_mode=ParseMode.HTML,
             disable_web_page_preview=True,
             reply_markup=keyboard,
         )
 
-
-def main() -> None:
-    """Запускает Telegram-бота и регистрирует обработчики."""
-    
+    await media.deliver_video(slug, send_video, send_text)
+
+
+async def post_init(app: Application) -> None:
+    """Запускает фоновый прогрев видео, чтобы пользователи не ждали первой загрузки."""
+    if VIDEO_WARMUP_CHAT_ID:
+        # Тоже не через app.create_task: app.stop() ждал бы загрузки всех оставшихся роликов
+        app.bot_data["video_warmup"] = asyncio.create_task(prewarm_videos.prewarm(app.bot, int(VIDEO_WARMUP_CHAT_ID)))
+    if METRICS_PORT:
+        app.bot_data["metrics_server"] = await metrics.start_server(port=METRICS_PORT)
+    if catalogue_reload.CATALOGUE_RELOAD_INTERVAL > 0:
+        # Бесконечная задача: не через app.create_task, иначе app.stop() будет её ждать
+        app.bot_data["catalogue_watcher"] = asyncio.create_task(catalogue_reload.CatalogueWatcher().run())
+
+
+async def shutdown(app: Application) -> None:
+    """Дожидается записи в БД и закрывает соединения при остановке бота."""
+    for name in ("video_warmup", "catalogue_watcher"):
+        task = app.bot_data.pop(name, None)
+        if task is not None:
+            task.cancel()
+    metrics_server = app.bot_data.pop("metrics_server", None)
+    if metrics_server is not None:
+        metrics_server.close()
+    db_async.shutdown()
+
+
+def register_metrics(app: Application) -> None:
+    """Подключает к /metrics статистику кэшей, очереди загрузок, лимитов и доставки."""
+    metrics.register_collector("favorites_cache", database.favorites_cache_stats)
+    metrics.register_collector("upload_scheduler", media.upload_scheduler.stats)
+    metrics.register_collector("delivery", media.delivery_stats, label="outcome")
+    if app.bot.rate_limiter is not None:
+        metrics.register_collector("rate_limiter", app.bot.rate_limiter.stats)
+
+
+def build_application(
+    token: str = TELEGRAM_BOT_TOKEN,
+    base_url: str = TELEGRAM_API_URL,
+    max_concurrent_updates: int = MAX_CONCURRENT_UPDATES,
+    rate_limit: bool = True,
+) -> Application:
+    """Готовит кэши и собирает приложение с обработчиками (без запуска)."""
     # Init Database
     database.init_db()
+    # Избранное и file_id пишем пачками в фоне; сбрасываются при остановке
+    database.start_write_behind()
+    # Индексы поиска, клавиатуры и подписи строим заранее, а не на первом сообщении
+    build_name_index()
+    build_render_cache()
 
-    app = (
+    builder = (
         ApplicationBuilder()
-        .token(TELEGRAM_BOT_TOKEN)
+        .token(token)
+        .base_url(base_url)
         .connect_timeout(60.0)
         .read_timeout(60.0)
         .write_timeout(120.0)  # Больше времени для загрузки видео
-        .build()
+        .post_init(post_init)
+        .post_shutdown(shutdown)
     )
+    if rate_limit:
+        # Лимиты Telegram на исходящие сообщения; метрики — app.bot.rate_limiter.stats()
+        builder = builder.rate_limiter(TokenBucketRateLimiter())
+    if max_concurrent_updates > 1:
+        builder = builder.concurrent_updates(PerChatUpdateProcessor(max_concurrent_updates))
+    app = builder.build()
+    register_metrics(app)
     app.add_handler(CommandHandler("start", start))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_choice))
     app.add_handler(CallbackQueryHandler(handle_callback))
-    
+    return app
+
+
+def main() -> None:
+    """Запускает Telegram-бота и регистрирует обработчики."""
+    app = build_application()
+
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL or not WEBHOOK_SECRET:
+            raise SystemExit("Для BOT_MODE=webhook задайте WEBHOOK_URL и WEBHOOK_SECRET")
+        print(f"Bot is starting webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}...", flush=True)
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+        return
+
     print("Bot is starting polling...", flush=True)
     app.run_polling()
 
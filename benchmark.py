@@ -0,0 +1,851 @@
+"""
+Микро-бенчмарки бота.
+
+Использование:
+    python benchmark.py db [--threads 8] [--calls 2000]
+    python benchmark.py loop [--handlers 200] [--writes 2000]
+    python benchmark.py search [--recipes 10000] [--queries 500]
+    python benchmark.py render [--calls 20000]
+    python benchmark.py webhook [--rounds 20]
+    python benchmark.py updates [--chats 50] [--per-chat 10] [--latency 0.02]
+    python benchmark.py metrics [--calls 100000]
+    python benchmark.py load [--sessions 200] [--users 50] [--latency 0.02]
+    python benchmark.py catalogue [--recipes 10000]
+    python benchmark.py reload [--recipes 10000]
+
+Бенчмарки работают на временной базе и не трогают cocktails.db.
+"""
+
+import argparse
+import asyncio
+import collections
+import importlib.util
+import itertools
+import json
+import marshal
+import random
+import socket
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import catalogue
+import catalogue_reload
+import cocktails_data as data
+import database
+import db_async
+import metrics
+import render
+import search
+from fake_bot_api import FakeBotApi, callback_update, text_update
+
+BOT_SCRIPT = Path(__file__).parent / "Untitled-1.py"
+RECORDED_UPDATES = Path(__file__).parent / "webhook_updates.json"
+
+# Исправляем кодировку для Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Возвращает перцентиль pct (0-100) из списка замеров."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_latency(label: str, samples: list[float], wall: float) -> None:
+    """Печатает сводку по задержкам в микросекундах."""
+    us = [s * 1_000_000 for s in samples]
+    print(
+        f"  {label:<12} calls={len(us):>6}  mean={statistics.fmean(us):8.1f} us  "
+        f"p50={percentile(us, 50):8.1f} us  p99={percentile(us, 99):8.1f} us  "
+        f"throughput={len(us) / wall:9.0f}/s"
+    )
+
+
+def run_threads(worker: Callable[[int, list[float]], None], threads: int) -> tuple[list[float], float]:
+    """Запускает worker в нескольких потоках, собирает замеры и общее время."""
+    results: list[list[float]] = [[] for _ in range(threads)]
+    pool = [threading.Thread(target=worker, args=(i, results[i])) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - started
+    return [s for chunk in results for s in chunk], wall
+
+
+# --- db: соединение на вызов против постоянного соединения ---
+
+def _legacy_recipe_view(user_id: int, slug: str) -> None:
+    """Старое поведение: новое соединение на каждый запрос (как send_cocktail_response)."""
+    with sqlite3.connect(database.DB_PATH) as conn:
+        conn.execute("SELECT 1 FROM favorites WHERE user_id = ? AND slug = ?", (user_id, slug)).fetchone()
+    with sqlite3.connect(database.DB_PATH) as conn:
+        conn.execute("SELECT file_id FROM video_cache WHERE slug = ?", (slug,)).fetchone()
+
+
+def _pooled_recipe_view(user_id: int, slug: str) -> None:
+    database.is_favorite(user_id, slug)
+    database.get_video_file_id(slug)
+
+
+def bench_db(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_connections()
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        for user_id in range(100):
+            database.add_favorite(user_id, "negroni")
+        database.save_video_file_id("negroni", "file-id")
+
+        print(f"[DB] Просмотр рецепта (is_favorite + get_video_file_id), потоков: {args.threads}")
+        for label, view in (("per-call", _legacy_recipe_view), ("pooled", _pooled_recipe_view)):
+            def worker(index: int, samples: list[float]) -> None:
+                for i in range(args.calls):
+                    started = time.perf_counter()
+                    view((index * args.calls + i) % 200, "negroni")
+                    samples.append(time.perf_counter() - started)
+
+            samples, wall = run_threads(worker, args.threads)
+            print_latency(label, samples, wall)
+        database.close_connections()
+
+
+# --- loop: задержка обработчиков во время всплеска записей ---
+
+async def _callback_probe(user_id: int, use_async: bool) -> None:
+    """Имитация handle_callback: чтение избранного и file_id, как при показе рецепта."""
+    if use_async:
+        await db_async.is_favorite(user_id, "negroni")
+        await db_async.get_video_file_id("negroni")
+    else:
+        database.is_favorite(user_id, "negroni")
+        database.get_video_file_id("negroni")
+    await asyncio.sleep(0)
+
+
+async def _write_burst(writes: int, use_async: bool) -> None:
+    """Всплеск переключений избранного от множества пользователей."""
+    for i in range(writes):
+        if use_async:
+            await db_async.toggle_favorite(1000 + i % 500, "mojito")
+        else:
+            database.toggle_favorite(1000 + i % 500, "mojito")
+            await asyncio.sleep(0)
+
+
+async def _measure_loop(args: argparse.Namespace, use_async: bool) -> tuple[list[float], float]:
+    samples: list[float] = []
+
+    async def handler(user_id: int, arrived: float) -> None:
+        # Задержка считается от планового прихода апдейта: если цикл был
+        # заблокирован синхронной записью, это ожидание тоже попадёт в замер.
+        await _callback_probe(user_id, use_async)
+        samples.append(time.perf_counter() - arrived)
+
+    async def arrivals() -> None:
+        tasks = []
+        first = time.perf_counter()
+        for i in range(args.handlers):
+            arrived = first + i * 0.001
+            delay = arrived - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(handler(i, arrived)))
+        await asyncio.gather(*tasks)
+
+    started = time.perf_counter()
+    burst = [_write_burst(args.writes // args.writers, use_async) for _ in range(args.writers)]
+    await asyncio.gather(arrivals(), *burst)
+    return samples, time.perf_counter() - started
+
+
+def bench_loop(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_connections()
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.SYNCHRONOUS = args.synchronous
+        database.init_db()
+        database.save_video_file_id("negroni", "file-id")
+
+        print(
+            f"[LOOP] {args.handlers} колбэков на фоне {args.writes} записей "
+            f"({args.writers} писателей, synchronous={args.synchronous})"
+        )
+        for label, use_async in (("sync", False), ("async", True)):
+            samples, wall = asyncio.run(_measure_loop(args, use_async))
+            print_latency(label, samples, wall)
+        db_async.shutdown()
+
+
+# --- search: индекс ингредиентов против линейного обхода ---
+
+def synthetic_catalogue(recipes: int, seed: int = 42) -> dict[str, dict]:
+    """Каталог из recipes рецептов на основе ингредиентов настоящего каталога."""
+    rng = random.Random(seed)
+    words = sorted({
+        ing.split(" ", 2)[-1]
+        for details in data.COCKTAIL_DETAILS.values()
+        for ing in details["ingredients"]
+    })
+    # Расширяем словарь, чтобы строки ингредиентов не повторялись слишком часто
+    words += [f"{word} №{i}" for i in range(20) for word in words[:50]]
+    catalogue = {}
+    for i in range(recipes):
+        ingredients = [
+            f"{rng.choice((10, 15, 20, 30, 45, 60))} мл {rng.choice(words)}"
+            for _ in range(rng.randint(3, 7))
+        ]
+        catalogue[f"cocktail_{i}"] = {
+            "title": f"Коктейль {i}",
+            "ingredients": ingredients,
+            "method": "Шейк.",
+        }
+    return catalogue
+
+
+def _legacy_search_by_ingredient(catalogue: dict[str, dict], query: str) -> list[tuple[str, str]]:
+    """Прежний search_by_ingredient: обход всех ингредиентов всех рецептов."""
+    query = query.lower()
+    results = []
+    for slug, details in catalogue.items():
+        for ing in details.get("ingredients", []):
+            if query in ing.lower():
+                results.append((slug, details["title"]))
+                break
+    return results
+
+
+def bench_search(args: argparse.Namespace) -> None:
+    catalogue = synthetic_catalogue(args.recipes)
+    rng = random.Random(7)
+    ingredients = [ing for details in catalogue.values() for ing in details["ingredients"]]
+    queries = []
+    for _ in range(args.queries):
+        ing = rng.choice(ingredients)
+        start = rng.randrange(len(ing) - 3)
+        queries.append(ing[start:start + rng.randint(3, 8)])
+    queries += ["несуществующий", "негрони", "вермут"]
+
+    started = time.perf_counter()
+    index = search.IngredientIndex(catalogue)
+    build = time.perf_counter() - started
+    print(f"[SEARCH] {args.recipes} рецептов, {len(queries)} запросов, индекс построен за {build * 1000:.0f} мс")
+
+    for label, run in (
+        ("scan", lambda q: _legacy_search_by_ingredient(catalogue, q)),
+        ("index", index.search),
+    ):
+        samples = []
+        started = time.perf_counter()
+        for query in queries:
+            t = time.perf_counter()
+            run(query)
+            samples.append(time.perf_counter() - t)
+        print_latency(label, samples, time.perf_counter() - started)
+
+    mismatches = sum(index.search(q) != _legacy_search_by_ingredient(catalogue, q) for q in queries[:50])
+    print(f"  Расхождений с линейным поиском: {mismatches}")
+
+    # Нечёткий поиск по названиям: случайные «слова» из слогов и запросы с опечатками
+    consonants = "бвгджзклмнпрстфхцчш"
+    syllables = [c + v for c in consonants for v in "аеиоуя"]
+    names = {}
+    for i in range(args.recipes):
+        name = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        names.setdefault(f"{name} {rng.choice(syllables)}{i % 97}", f"cocktail_{i}")
+    started = time.perf_counter()
+    fuzzy = search.FuzzyNameIndex(names)
+    build = time.perf_counter() - started
+    typo_queries = []
+    for name in rng.sample(list(names), min(args.queries, len(names))):
+        pos = rng.randrange(len(name))
+        typo_queries.append(name[:pos] + name[pos + 1:])
+    print(f"[FUZZY] {len(names)} названий, индекс построен за {build * 1000:.0f} мс")
+    samples = []
+    started = time.perf_counter()
+    for query in typo_queries:
+        t = time.perf_counter()
+        fuzzy.similar(query)
+        samples.append(time.perf_counter() - t)
+    print_latency("trigram", samples, time.perf_counter() - started)
+
+
+# --- render: сборка клавиатур и подписей на запрос против кэша ---
+
+def _legacy_recipe_render(slug: str, is_fav: bool) -> tuple:
+    """Прежняя сборка клавиатуры и подписи рецепта на каждый показ."""
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+    fav_text = "✅ В избранном" if is_fav else "⭐ Добавить в избранное"
+    keyboard = InlineKeyboardMarkup([
+        [InlineKeyboardButton(fav_text, callback_data=f"{data.FAV_ADD_PREFIX}:{slug}")],
+        [InlineKeyboardButton("← Назад", callback_data=data.BACK_CALLBACK_ALC)],
+    ])
+    return keyboard, render.format_cocktail_details(data.COCKTAIL_DETAILS[slug])
+
+
+def _legacy_list_render() -> object:
+    """Прежняя сборка списка алкогольных коктейлей."""
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+    buttons = [
+        InlineKeyboardButton(text=label, callback_data=f"{data.ALCOHOL_PREFIX}:{slug}")
+        for slug, label in data.ALCOHOLIC_COCKTAILS
+    ]
+    buttons.append(InlineKeyboardButton("← Назад", callback_data=data.MENU_BACK_CALLBACK))
+    return InlineKeyboardMarkup.from_column(buttons)
+
+
+def _cached_recipe_render(slug: str, is_fav: bool) -> tuple:
+    cache = render.get_render_cache()
+    return cache.recipe_keyboard(slug, is_fav, data.BACK_CALLBACK_ALC), render.cocktail_caption(slug, {})
+
+
+def bench_render(args: argparse.Namespace) -> None:
+    if args.recipes:
+        data.set_catalogue(catalogue.compile_catalogue(_synthetic_records(args.recipes)))
+    slugs = list(data.COCKTAIL_DETAILS)
+    started = time.perf_counter()
+    cache = render.build_render_cache()
+    print(f"[RENDER] Кэш построен за {(time.perf_counter() - started) * 1000:.1f} мс, рецептов: {len(slugs)}")
+
+    # Размер reply_markup в запросе к Bot API: весь список против одной страницы
+    whole = json.dumps(_legacy_list_render().to_dict(), ensure_ascii=False).encode()
+    page = json.dumps(cache.list_page(data.ALCOHOL_PREFIX).to_dict(), ensure_ascii=False).encode()
+    print(
+        f"[RENDER] Клавиатура списка: целиком {len(whole) / 1024:.1f} КБ "
+        f"({len(data.ALCOHOLIC_COCKTAILS)} кнопок), страница {len(page)} байт ({render.PAGE_SIZE} кнопок)"
+    )
+
+    cases = (
+        ("recipe old", lambda i: _legacy_recipe_render(slugs[i % len(slugs)], i % 2 == 0)),
+        ("recipe new", lambda i: _cached_recipe_render(slugs[i % len(slugs)], i % 2 == 0)),
+        ("list old", lambda i: _legacy_list_render()),
+        ("list new", lambda i: render.get_render_cache().list_page(data.ALCOHOL_PREFIX, i % 3)),
+    )
+    for label, run in cases:
+        samples = []
+        started = time.perf_counter()
+        for i in range(args.calls):
+            t = time.process_time()
+            run(i)
+            samples.append(time.process_time() - t)
+        print_latency(label, samples, time.perf_counter() - started)
+
+
+# --- webhook: записанные апдейты через встроенный HTTP-сервер ---
+
+def load_bot_module():
+    """Импортирует модуль бота (имя файла не является корректным именем модуля)."""
+    spec = importlib.util.spec_from_file_location("cocktail_bot", BOT_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_idle(api: FakeBotApi, quiet: float = 0.2, timeout: float = 30.0) -> None:
+    """Ждёт, пока бот перестанет обращаться к API (все апдейты обработаны)."""
+    deadline = time.monotonic() + timeout
+    seen = -1
+    while len(api.calls) != seen and time.monotonic() < deadline:
+        seen = len(api.calls)
+        await asyncio.sleep(quiet)
+
+
+# Методы, которые бот вызывает на записанных апдейтах (служебные getMe/setWebhook не в счёт)
+WEBHOOK_EXPECTED_METHODS = {"answerCallbackQuery", "editMessageMedia", "sendMessage", "sendPhoto"}
+
+
+async def _replay_webhook(args: argparse.Namespace) -> list[str]:
+    """Прогоняет записанные апдейты через вебхук; возвращает список расхождений с ожидаемым."""
+    import httpx
+
+    api = FakeBotApi()
+    await api.start()
+    bot = load_bot_module()
+    app = bot.build_application("123456:TEST", api.base_url)
+    port, secret = free_port(), "replay-secret"
+    await app.initialize()
+    await app.start()
+    await app.updater.start_webhook(
+        listen="127.0.0.1",
+        port=port,
+        url_path="telegram",
+        webhook_url=f"http://127.0.0.1:{port}/telegram",
+        secret_token=secret,
+        max_connections=args.max_connections,
+    )
+    updates = json.loads(RECORDED_UPDATES.read_text(encoding="utf-8"))
+    url = f"http://127.0.0.1:{port}/telegram"
+    problems = []
+    try:
+        async with httpx.AsyncClient() as client:
+            rejected = await client.post(
+                url, json=updates[0], headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}
+            )
+            print(f"[WEBHOOK] Неверный секрет: HTTP {rejected.status_code}")
+            if rejected.status_code != 403:
+                problems.append(f"апдейт с неверным секретом: HTTP {rejected.status_code}, ожидается 403")
+
+            samples = []
+            started = time.perf_counter()
+            for round_no in range(args.rounds):
+                for update in updates:
+                    payload = {**update, "update_id": update["update_id"] + round_no * 1000}
+                    t = time.perf_counter()
+                    response = await client.post(
+                        url, json=payload, headers={"X-Telegram-Bot-Api-Secret-Token": secret}
+                    )
+                    response.raise_for_status()
+                    samples.append(time.perf_counter() - t)
+            await wait_until_idle(api)
+            wall = time.perf_counter() - started
+        print_latency("accept", samples, wall)
+        handled = {method for method, _ in api.calls} - {"getMe", "setWebhook", "deleteWebhook"}
+        print(f"  Вызовы Bot API: {len(api.calls)}, методы: {', '.join(sorted(handled))}")
+        if handled != WEBHOOK_EXPECTED_METHODS:
+            problems.append(f"методы Bot API: ожидались {', '.join(sorted(WEBHOOK_EXPECTED_METHODS))}")
+    finally:
+        await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+        await api.stop()
+    return problems
+
+
+def bench_webhook(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_connections()
+        database.DB_PATH = Path(tmp) / "bench.db"
+        problems = asyncio.run(_replay_webhook(args))
+    # Выходим с ненулевым кодом уже после остановки вебхука и фейкового API
+    if problems:
+        raise SystemExit("[WEBHOOK] Не совпало: " + "; ".join(problems))
+
+
+# --- updates: последовательная обработка против параллельной по чатам ---
+
+async def _run_updates(args: argparse.Namespace, max_concurrent: int) -> tuple[float, int]:
+    """Прогоняет апдейты через polling; возвращает время и число чатов с нарушенным порядком."""
+    api = FakeBotApi(latency=args.latency, flood_every=args.flood_every)
+    await api.start()
+    bot = load_bot_module()
+    app = bot.build_application(
+        "123456:TEST", api.base_url, max_concurrent_updates=max_concurrent, rate_limit=args.rate_limit
+    )
+    names = ["негрони", "маргарита", "мохито (безалк.)", "олд фешен"]
+    expected: dict[int, list[str]] = {}
+    update_id = 1
+    for n in range(args.per_chat):
+        for chat_id in range(1, args.chats + 1):
+            name = names[(chat_id + n) % len(names)]
+            expected.setdefault(chat_id, []).append(search.find_cocktail_slug(name))
+            api.updates.put_nowait(text_update(update_id, chat_id, name))
+            update_id += 1
+    total = args.chats * args.per_chat
+
+    await app.initialize()
+    await app.start()
+    started = time.perf_counter()
+    await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    while api.count("sendMessage") + api.count("sendVideo") < total:
+        await asyncio.sleep(0.01)
+    wall = time.perf_counter() - started
+    if app.bot.rate_limiter is not None:
+        stats = app.bot.rate_limiter.stats()
+        print(
+            f"    лимитер: задержано {stats['delayed']}/{stats['requests']}, "
+            f"макс. ожидание {stats['queue_delay_seconds_max']:.2f} с, RetryAfter: {stats['retry_after']}"
+        )
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    await api.stop()
+
+    # Порядок ответов внутри каждого чата должен совпадать с порядком апдейтов
+    titles = {slug: data.COCKTAIL_DETAILS[slug]["title"] for slug in data.COCKTAIL_DETAILS}
+    received: dict[int, list[str]] = {}
+    for method, params in api.calls:
+        if method in ("sendMessage", "sendVideo"):
+            text = params.get("text") or params.get("caption") or ""
+            slug = next((s for s, t in titles.items() if f"<b>{t}</b>" in text), None)
+            received.setdefault(int(params["chat_id"]), []).append(slug)
+    broken = sum(received.get(chat_id) != slugs for chat_id, slugs in expected.items())
+    return wall, broken
+
+
+def bench_updates(args: argparse.Namespace) -> None:
+    total = args.chats * args.per_chat
+    print(
+        f"[UPDATES] {args.chats} чатов x {args.per_chat} сообщений, "
+        f"задержка API {args.latency * 1000:.0f} мс"
+    )
+    for label, concurrency in (("sequential", 1), (f"per-chat x{args.concurrency}", args.concurrency)):
+        with tempfile.TemporaryDirectory() as tmp:
+            database.close_connections()
+            database.DB_PATH = Path(tmp) / "bench.db"
+            wall, broken = asyncio.run(_run_updates(args, concurrency))
+        print(f"  {label:<16} {total / wall:8.0f} апдейтов/с  ({wall:.2f} с), чатов с нарушенным порядком: {broken}")
+
+
+# --- metrics: цена инструментирования и содержимое /metrics ---
+
+async def _noop_handler(update: object, context: object) -> None:
+    return None
+
+
+async def _measure_instrument(handler: Callable, calls: int) -> list[float]:
+    samples = []
+    for _ in range(calls):
+        t = time.perf_counter()
+        await handler(None, None)
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+async def _scrape_metrics(args: argparse.Namespace) -> str:
+    """Прогоняет несколько апдейтов через бота с включёнными метриками и читает /metrics."""
+    api = FakeBotApi(latency=0.005)
+    await api.start()
+    bot = load_bot_module()
+    app = bot.build_application("123456:TEST", api.base_url)
+    for update_id, name in enumerate(("негрони", "маргарита", "мохито (безалк.)", "олд фешен"), start=1):
+        api.updates.put_nowait(text_update(update_id, update_id, name))
+    port = free_port()
+    server = await metrics.start_server("127.0.0.1", port)
+
+    await app.initialize()
+    await app.start()
+    await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    while api.count("sendMessage") + api.count("sendVideo") < 4:
+        await asyncio.sleep(0.01)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    response = (await reader.read()).decode()
+    writer.close()
+    server.close()
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    await api.stop()
+    return response.split("\r\n\r\n", 1)[1]
+
+
+def bench_metrics(args: argparse.Namespace) -> None:
+    print(f"[METRICS] Обработчик-заглушка, {args.calls} вызовов")
+    wrapped = metrics.instrument(_noop_handler)
+    for label, handler, state in (
+        ("bare", _noop_handler, False),
+        ("disabled", wrapped, False),
+        ("enabled", wrapped, True),
+    ):
+        metrics.enable(state)
+        started = time.perf_counter()
+        samples = asyncio.run(_measure_instrument(handler, args.calls))
+        print_latency(label, samples, time.perf_counter() - started)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_connections()
+        database.DB_PATH = Path(tmp) / "bench.db"
+        body = asyncio.run(_scrape_metrics(args))
+    lines = [line for line in body.splitlines() if line and not line.startswith("#")]
+    print(f"[METRICS] /metrics: {len(lines)} серий, например:")
+    for prefix in ("bot_handler_seconds_count", "bot_db_seconds_count", "bot_favorites_cache_", "bot_delivery_"):
+        for line in [line for line in lines if line.startswith(prefix)][:2]:
+            print(f"  {line}")
+
+
+# --- load: сценарии пользователей против настоящих обработчиков ---
+
+# Шаги сессии: (шаг, тип апдейта, текст или callback_data; {slug}/{name} — выбранный коктейль)
+SESSION_STEPS = (
+    ("menu", "text", "/start"),
+    ("list", "text", "1. Алкогольный"),
+    ("recipe", "callback", f"{data.ALCOHOL_PREFIX}:{{slug}}"),
+    ("favorite", "callback", f"{data.FAV_ADD_PREFIX}:{{slug}}"),
+    ("favorites", "text", "Избранные коктейли⭐"),
+    ("search", "text", "{name}"),
+)
+STEP_TIMEOUT = 60.0
+
+
+def _wrap_handlers(app, finished: Callable[[int, str], None]) -> None:
+    """Оборачивает колбэки обработчиков, чтобы узнать, когда апдейт обработан."""
+    for handler in app.handlers[0]:
+        async def wrapper(update, context, callback=handler.callback):
+            try:
+                return await callback(update, context)
+            finally:
+                finished(update.update_id, callback.__name__)
+
+        handler.callback = wrapper
+
+
+async def _run_load(args: argparse.Namespace) -> None:
+    api = FakeBotApi(latency=args.latency, upload_bytes_per_sec=args.upload_rate, flood_every=args.flood_every)
+    await api.start()
+    bot = load_bot_module()
+    app = bot.build_application(
+        "123456:TEST", api.base_url, max_concurrent_updates=args.concurrency, rate_limit=args.rate_limit
+    )
+    loop = asyncio.get_running_loop()
+    update_ids = itertools.count(1)
+    pending: dict[int, tuple[str, float, asyncio.Future]] = {}
+    samples: dict[tuple[str, str], list[float]] = collections.defaultdict(list)
+
+    def finished(update_id: int, handler_name: str) -> None:
+        step, sent_at, future = pending.pop(update_id)
+        samples[(step, handler_name)].append(time.perf_counter() - sent_at)
+        future.set_result(None)
+
+    _wrap_handlers(app, finished)
+    rng = random.Random(42)
+    names = dict(data.ALCOHOLIC_COCKTAILS)
+    users = asyncio.Semaphore(args.users)
+    timeouts = 0
+
+    async def session(chat_id: int) -> None:
+        nonlocal timeouts
+        slug = rng.choice(list(names))
+        async with users:
+            for step, kind, template in SESSION_STEPS:
+                update_id = next(update_ids)
+                payload = template.format(slug=slug, name=names[slug])
+                if kind == "text":
+                    update = text_update(update_id, chat_id, payload)
+                else:
+                    update = callback_update(update_id, chat_id, payload)
+                future = loop.create_future()
+                pending[update_id] = (step, time.perf_counter(), future)
+                api.updates.put_nowait(update)
+                try:
+                    await asyncio.wait_for(future, STEP_TIMEOUT)
+                except asyncio.TimeoutError:
+                    timeouts += 1
+                    return
+
+    await app.initialize()
+    await app.start()
+    await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    started = time.perf_counter()
+    await asyncio.gather(*(session(chat_id) for chat_id in range(1, args.sessions + 1)))
+    wall = time.perf_counter() - started
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    await api.stop()
+
+    handled = sum(len(values) for values in samples.values())
+    print(
+        f"  {handled} апдейтов за {wall:.2f} с: {handled / wall:.0f} апдейтов/с, "
+        f"{args.sessions / wall:.1f} сессий/с, таймаутов: {timeouts}"
+    )
+    print("  От постановки апдейта в getUpdates до конца обработчика:")
+    for (step, handler_name), values in samples.items():
+        ms = [value * 1000 for value in values]
+        print(
+            f"  {step:<10} {handler_name:<16} n={len(ms):>5}  p50={percentile(ms, 50):7.1f} ms  "
+            f"p95={percentile(ms, 95):7.1f} ms  p99={percentile(ms, 99):7.1f} ms"
+        )
+    methods = collections.Counter(method for method, _ in api.calls)
+    print("  Вызовы Bot API: " + ", ".join(f"{method}={n}" for method, n in sorted(methods.items())))
+
+
+def bench_load(args: argparse.Namespace) -> None:
+    print(
+        f"[LOAD] {args.sessions} сессий ({len(SESSION_STEPS)} шагов), одновременно {args.users} пользователей, "
+        f"задержка API {args.latency * 1000:.0f} мс"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_connections()
+        database.DB_PATH = Path(tmp) / "bench.db"
+        asyncio.run(_run_load(args))
+
+
+# --- catalogue: время загрузки каталога при старте ---
+
+def _synthetic_records(recipes: int) -> list[dict]:
+    records = []
+    for i, (slug, details) in enumerate(synthetic_catalogue(recipes).items()):
+        kind = catalogue.KINDS[i % 2]
+        records.append({"slug": slug, "name": details["title"], "kind": kind, **details, "video": f"{slug}.mp4"})
+    return records
+
+
+def _literal_module_source(records: list[dict]) -> str:
+    """Каталог в виде Python-литералов, как раньше в cocktails_data.py."""
+    compiled = catalogue.compile_catalogue(records)
+    return (
+        f"ALCOHOLIC_COCKTAILS = {compiled.alcoholic!r}\n"
+        f"NON_ALCOHOLIC_COCKTAILS = {compiled.non_alcoholic!r}\n"
+        "ALCOHOLIC_SLUGS = {slug for slug, _ in ALCOHOLIC_COCKTAILS}\n"
+        "NON_ALCOHOLIC_SLUGS = {slug for slug, _ in NON_ALCOHOLIC_COCKTAILS}\n"
+        "ALL_SLUGS = ALCOHOLIC_SLUGS | NON_ALCOHOLIC_SLUGS\n"
+        f"COCKTAIL_DETAILS = {compiled.details!r}\n"
+        f"COCKTAIL_VIDEOS = {compiled.videos!r}\n"
+    )
+
+
+def bench_catalogue(args: argparse.Namespace) -> None:
+    records = _synthetic_records(args.recipes)
+    print(f"[CATALOGUE] {args.recipes} рецептов, время загрузки при старте (медиана из {args.repeat})")
+    with tempfile.TemporaryDirectory() as tmp:
+        module_path = Path(tmp) / "catalogue_literals.py"
+        module_path.write_text(_literal_module_source(records), encoding="utf-8")
+        json_path = Path(tmp) / "catalogue.json"
+        catalogue.write_json(records, json_path)
+        sqlite_path = Path(tmp) / "catalogue.db"
+        catalogue.write_sqlite(records, sqlite_path)
+        pyc = marshal.dumps(compile(module_path.read_text(encoding="utf-8"), str(module_path), "exec"))
+
+        cases = (
+            # Первый старт после правки: модуль компилируется заново
+            ("python literals, compile", lambda: exec(compile(module_path.read_text(encoding="utf-8"), "m", "exec"), {})),
+            # Повторный старт с готовым .pyc
+            ("python literals, .pyc", lambda: exec(marshal.loads(pyc), {})),
+            ("json", lambda: catalogue.load_catalogue(json_path)),
+            ("sqlite", lambda: catalogue.load_catalogue(sqlite_path)),
+        )
+        for label, load in cases:
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                load()
+                samples.append(time.perf_counter() - started)
+            size = {"json": json_path, "sqlite": sqlite_path}.get(label, module_path).stat().st_size
+            print(f"  {label:<26} {statistics.median(samples) * 1000:8.1f} мс  файл {size / 1024:8.0f} КиБ")
+
+
+# --- reload: перезагрузка каталога на работающем event loop ---
+
+async def _max_loop_lag(work: Callable[[], object], tick: float = 0.001) -> tuple[float, float]:
+    """Выполняет work() и возвращает (его длительность, максимальную задержку тиков loop)."""
+    lag = 0.0
+    done = False
+
+    async def probe() -> None:
+        nonlocal lag
+        while not done:
+            planned = time.perf_counter() + tick
+            await asyncio.sleep(tick)
+            lag = max(lag, time.perf_counter() - planned)
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    result = work()
+    if asyncio.iscoroutine(result):
+        await result
+    elapsed = time.perf_counter() - started
+    done = True
+    await probe_task
+    return elapsed, lag
+
+
+def bench_reload(args: argparse.Namespace) -> None:
+    print(f"[RELOAD] Каталог из {args.recipes} рецептов")
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_connections()
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        path = Path(tmp) / "catalogue.json"
+        catalogue.write_json(_synthetic_records(args.recipes), path)
+        watcher = catalogue_reload.CatalogueWatcher(path)
+
+        def inline() -> None:
+            catalogue_reload.install_snapshot(catalogue_reload.build_snapshot(path))
+
+        for label, work in (("in event loop", inline), ("off event loop", watcher.reload)):
+            elapsed, lag = asyncio.run(_max_loop_lag(work))
+            print(f"  {label:<16} перезагрузка {elapsed * 1000:7.1f} мс, макс. задержка event loop {lag * 1000:7.1f} мс")
+        print(f"  В кэше отрисовки {len(render.get_render_cache().captions)} подписей, "
+              f"в индексе имён {len(search.NAME_TO_SLUG)} названий")
+        db_async.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки бота")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    db_parser = sub.add_parser("db", help="задержка вызовов database.*")
+    db_parser.add_argument("--threads", type=int, default=8)
+    db_parser.add_argument("--calls", type=int, default=2000)
+    db_parser.set_defaults(func=bench_db)
+
+    loop_parser = sub.add_parser("loop", help="p99 обработчиков во время записи в БД")
+    loop_parser.add_argument("--handlers", type=int, default=200)
+    loop_parser.add_argument("--writes", type=int, default=2000)
+    loop_parser.add_argument("--writers", type=int, default=4)
+    loop_parser.add_argument("--synchronous", default="FULL", help="FULL имитирует fsync на каждый commit")
+    loop_parser.set_defaults(func=bench_loop)
+
+    search_parser = sub.add_parser("search", help="поиск по ингредиентам на синтетическом каталоге")
+    search_parser.add_argument("--recipes", type=int, default=10_000)
+    search_parser.add_argument("--queries", type=int, default=500)
+    search_parser.set_defaults(func=bench_search)
+
+    render_parser = sub.add_parser("render", help="CPU на сборку клавиатур и подписей")
+    render_parser.add_argument("--calls", type=int, default=20_000)
+    render_parser.add_argument("--recipes", type=int, default=0, help="синтетический каталог (0 — текущий)")
+    render_parser.set_defaults(func=bench_render)
+
+    webhook_parser = sub.add_parser("webhook", help="записанные апдейты через webhook-сервер бота")
+    webhook_parser.add_argument("--rounds", type=int, default=20)
+    webhook_parser.add_argument("--max-connections", type=int, default=40)
+    webhook_parser.set_defaults(func=bench_webhook)
+
+    updates_parser = sub.add_parser("updates", help="пропускная способность обработки апдейтов")
+    updates_parser.add_argument("--chats", type=int, default=50)
+    updates_parser.add_argument("--per-chat", type=int, default=10)
+    updates_parser.add_argument("--latency", type=float, default=0.02)
+    updates_parser.add_argument("--concurrency", type=int, default=32)
+    updates_parser.add_argument("--rate-limit", action="store_true", help="включить лимиты Telegram")
+    updates_parser.add_argument("--flood-every", type=int, default=0, help="каждый N-й запрос получает 429")
+    updates_parser.set_defaults(func=bench_updates)
+
+    metrics_parser = sub.add_parser("metrics", help="накладные расходы метрик и вывод /metrics")
+    metrics_parser.add_argument("--calls", type=int, default=100_000)
+    metrics_parser.set_defaults(func=bench_metrics)
+
+    load_parser = sub.add_parser("load", help="сессии пользователей: меню, список, рецепт, избранное, поиск")
+    load_parser.add_argument("--sessions", type=int, default=200)
+    load_parser.add_argument("--users", type=int, default=50, help="одновременно активных пользователей")
+    load_parser.add_argument("--latency", type=float, default=0.02)
+    load_parser.add_argument("--upload-rate", type=float, default=0.0, help="скорость загрузки файлов, байт/с")
+    load_parser.add_argument("--concurrency", type=int, default=32, help="MAX_CONCURRENT_UPDATES бота")
+    load_parser.add_argument("--rate-limit", action="store_true", help="включить лимиты Telegram")
+    load_parser.add_argument("--flood-every", type=int, default=0, help="каждый N-й запрос получает 429")
+    load_parser.set_defaults(func=bench_load)
+
+    catalogue_parser = sub.add_parser("catalogue", help="загрузка каталога: литералы, JSON, SQLite")
+    catalogue_parser.add_argument("--recipes", type=int, default=10_000)
+    catalogue_parser.add_argument("--repeat", type=int, default=5)
+    catalogue_parser.set_defaults(func=bench_catalogue)
+
+    reload_parser = sub.add_parser("reload", help="перезагрузка каталога и задержка event loop")
+    reload_parser.add_argument("--recipes", type=int, default=10_000)
+    reload_parser.set_defaults(func=bench_reload)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
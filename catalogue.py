@@ -0,0 +1,193 @@
+"""
+Хранилище каталога коктейлей вне кода.
+
+Каталог — список записей (по одной на коктейль) в JSON-файле или в SQLite.
+load_catalogue читает его и собирает Catalogue: списки кнопок по разделам,
+словари рецептов и видео и заранее посчитанные множества слагов. Имена в
+cocktails_data.py — фасад над загруженным Catalogue, так что остальной код
+ничего не знает о формате хранения.
+
+Запись каталога:
+    {"slug": "negroni", "name": "Негрони", "kind": "alcoholic",
+     "title": "...", "ingredients": ["..."], "method": "...",
+     "garnish": "...", "note": "...", "video": "negroni.mp4"}
+garnish, note и video необязательны; kind — alcoholic или non_alcoholic.
+
+Собрать SQLite из JSON:
+    python catalogue.py compile catalogue.json catalogue.db
+"""
+
+import json
+import sqlite3
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+KINDS = ("alcoholic", "non_alcoholic")
+# Поля рецепта, которые попадают в COCKTAIL_DETAILS, в порядке вывода
+DETAIL_FIELDS = ("title", "ingredients", "method", "garnish", "note")
+FORMAT_VERSION = 1
+# slug уходит в callback_data кнопок вместе с префиксом («favlist:») — у Telegram
+# на всё 64 байта
+MAX_SLUG_BYTES = 48
+
+
+@dataclass(frozen=True)
+class Catalogue:
+    """Каталог в том виде, в каком его используют обработчики, поиск и рендер."""
+
+    alcoholic: list[tuple[str, str]]  # (slug, подпись кнопки) в порядке каталога
+    non_alcoholic: list[tuple[str, str]]
+    details: dict[str, dict]
+    videos: dict[str, Optional[str]]
+    alcoholic_slugs: frozenset[str]
+    non_alcoholic_slugs: frozenset[str]
+    all_slugs: frozenset[str]
+
+
+def compile_catalogue(records: Iterable[dict]) -> Catalogue:
+    """Проверяет записи и собирает из них Catalogue."""
+    sections: dict[str, list[tuple[str, str]]] = {kind: [] for kind in KINDS}
+    details: dict[str, dict] = {}
+    videos: dict[str, Optional[str]] = {}
+    for record in records:
+        if not isinstance(record, dict) or not isinstance(record.get("slug"), str):
+            raise ValueError(f"Запись каталога должна быть объектом со строковым slug: {record!r}")
+        slug = record["slug"]
+        if slug in details:
+            raise ValueError(f"Повторяющийся slug в каталоге: {slug}")
+        if len(slug.encode()) > MAX_SLUG_BYTES:
+            raise ValueError(f"{slug}: slug длиннее {MAX_SLUG_BYTES} байт не поместится в callback_data")
+        kind = record.get("kind")
+        if kind not in sections:
+            raise ValueError(f"{slug}: неизвестный раздел {kind!r}, ожидается один из {KINDS}")
+        sections[kind].append((slug, record["name"]))
+        details[slug] = {field: record[field] for field in DETAIL_FIELDS if record.get(field) is not None}
+        videos[slug] = record.get("video")
+
+    alcoholic_slugs = frozenset(slug for slug, _ in sections["alcoholic"])
+    non_alcoholic_slugs = frozenset(slug for slug, _ in sections["non_alcoholic"])
+    return Catalogue(
+        alcoholic=sections["alcoholic"],
+        non_alcoholic=sections["non_alcoholic"],
+        details=details,
+        videos=videos,
+        alcoholic_slugs=alcoholic_slugs,
+        non_alcoholic_slugs=non_alcoholic_slugs,
+        all_slugs=alcoholic_slugs | non_alcoholic_slugs,
+    )
+
+
+# --- JSON ---
+
+def read_json(path: Path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    if not isinstance(document, dict):
+        raise ValueError(f"{path}: ожидается объект с version и cocktails")
+    if document.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: неподдерживаемая версия каталога {document.get('version')!r}")
+    if not isinstance(document.get("cocktails"), list):
+        raise ValueError(f"{path}: cocktails должен быть списком")
+    return document["cocktails"]
+
+
+def write_json(records: Iterable[dict], path: Path) -> None:
+    document = {"version": FORMAT_VERSION, "cocktails": list(records)}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+# --- SQLite ---
+
+_SCHEMA = """
+CREATE TABLE cocktails (
+    position INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL,
+    method TEXT,
+    garnish TEXT,
+    note TEXT,
+    video TEXT
+);
+CREATE TABLE ingredients (
+    slug TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (slug, position)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = ("slug", "name", "kind", "title", "method", "garnish", "note", "video")
+
+
+def read_sqlite(path: Path) -> list[dict]:
+    # Только чтение: каталог собирают отдельно, бот его не меняет
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        ingredients: dict[str, list[str]] = {}
+        for slug, text in conn.execute("SELECT slug, text FROM ingredients ORDER BY slug, position"):
+            ingredients.setdefault(slug, []).append(text)
+        records = []
+        for row in conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM cocktails ORDER BY position"):
+            record = dict(zip(_COLUMNS, row))
+            record["ingredients"] = ingredients.get(record["slug"], [])
+            records.append(record)
+        return records
+    finally:
+        conn.close()
+
+
+def write_sqlite(records: Iterable[dict], path: Path) -> None:
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.executescript(_SCHEMA)
+            for position, record in enumerate(records):
+                conn.execute(
+                    f"INSERT INTO cocktails (position, {', '.join(_COLUMNS)}) VALUES (?{', ?' * len(_COLUMNS)})",
+                    (position, *(record.get(column) for column in _COLUMNS)),
+                )
+                conn.executemany(
+                    "INSERT INTO ingredients (slug, position, text) VALUES (?, ?, ?)",
+                    ((record["slug"], i, text) for i, text in enumerate(record.get("ingredients", []))),
+                )
+    finally:
+        conn.close()
+
+
+def _is_sqlite(path: Path) -> bool:
+    return path.suffix in (".db", ".sqlite", ".sqlite3")
+
+
+def read_records(path: Union[str, Path]) -> list[dict]:
+    """Читает записи каталога; формат определяется по расширению файла."""
+    path = Path(path)
+    return read_sqlite(path) if _is_sqlite(path) else read_json(path)
+
+
+def load_catalogue(path: Union[str, Path]) -> Catalogue:
+    """Читает каталог из JSON или SQLite и собирает Catalogue."""
+    return compile_catalogue(read_records(path))
+
+
+def main() -> None:
+    if len(sys.argv) != 4 or sys.argv[1] != "compile":
+        raise SystemExit("Использование: python catalogue.py compile <источник> <назначение>")
+    source, target = Path(sys.argv[2]), Path(sys.argv[3])
+    records = read_records(source)
+    compile_catalogue(records)  # Проверяем до записи
+    if _is_sqlite(target):
+        write_sqlite(records, target)
+    else:
+        write_json(records, target)
+    print(f"Каталог: {len(records)} коктейлей, {source} -> {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Перезагрузка каталога без перезапуска бота.
+
+CatalogueWatcher раз в CATALOGUE_RELOAD_INTERVAL секунд проверяет время
+изменения и размер файла каталога. Если файл изменился, новый снимок (каталог,
+индексы поиска, подписи и клавиатуры) собирается в отдельном потоке, а затем
+ставится одной синхронной операцией в event loop — между заменой каталога,
+индексов и кэша отрисовки нет await, так что ни один обработчик не увидит их
+вперемешку. Ошибка в файле не ломает бота: остаётся прежний снимок.
+
+Заодно watcher перечитывает манифест хранилища видео (media_store), когда
+compress_videos.py добавляет или пережимает ролики.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import cocktails_data as data
+import db_async
+import media_store
+import metrics
+import render
+import search
+from catalogue import Catalogue, load_catalogue
+
+CATALOGUE_RELOAD_INTERVAL = float(os.environ.get("CATALOGUE_RELOAD_INTERVAL", "5"))  # 0 — не следить
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Всё, что строится из каталога, — собирается и ставится целиком."""
+
+    catalogue: Catalogue
+    search_index: search.SearchIndex
+    render_cache: render.RenderCache
+
+
+def build_snapshot(path: Path) -> Snapshot:
+    """Читает каталог и строит индексы и кэш отрисовки. Глобальное состояние не трогает."""
+    new = load_catalogue(path)
+    return Snapshot(new, search.compile_search_index(new), render.RenderCache(new))
+
+
+def install_snapshot(snapshot: Snapshot) -> list[str]:
+    """Делает снимок текущим. Возвращает слаги, у которых сменился источник видео."""
+    old_videos = data.COCKTAIL_VIDEOS
+    data.set_catalogue(snapshot.catalogue)
+    search.set_search_index(snapshot.search_index)
+    render.set_render_cache(snapshot.render_cache)
+    return [
+        slug for slug, source in old_videos.items()
+        if snapshot.catalogue.videos.get(slug) != source
+    ]
+
+
+class CatalogueWatcher:
+    """Следит за файлом каталога и перезагружает его при изменении."""
+
+    def __init__(self, path: Path = data.CATALOGUE_PATH, interval: float = CATALOGUE_RELOAD_INTERVAL) -> None:
+        self.path = path
+        self.interval = interval
+        self._signature = self._stat()
+        self.reloads = 0
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def reload(self) -> bool:
+        """Собирает снимок вне event loop и ставит его. False — файл не прочитался."""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            snapshot = await loop.run_in_executor(None, build_snapshot, self.path)
+        except Exception as e:
+            # Любая ошибка в файле (не тот JSON, запись не того типа) оставляет прежний каталог
+            print(f"Catalogue reload failed, keeping the previous one: {e!r}", flush=True)
+            return False
+        changed_videos = install_snapshot(snapshot)
+        # file_id старого видео не подходит к новому файлу — пусть загрузится заново.
+        # Ролики из хранилища кэшируются по хэшу и получают новый ключ сами
+        for slug in changed_videos:
+            await db_async.delete_video_file_id(slug)
+        elapsed = time.perf_counter() - started
+        self.reloads += 1
+        if metrics.enabled:
+            metrics.CATALOGUE_RELOAD_SECONDS.observe(elapsed)
+        print(
+            f"Catalogue reloaded: {len(snapshot.catalogue.details)} cocktails, "
+            f"{len(changed_videos)} videos changed, {elapsed * 1000:.1f} ms",
+            flush=True,
+        )
+        return True
+
+    def reload_media_store(self) -> None:
+        # Манифест маленький: читаем прямо в event loop, чтобы видео и блобы
+        # подменились вместе, без await между ними
+        try:
+            if media_store.store.reload_if_changed():
+                print(f"Media store reloaded: {len(media_store.store.videos)} videos", flush=True)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Media store reload failed, keeping the previous one: {e!r}", flush=True)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                # Задачу никто не ждёт: упав, она молча выключила бы перезагрузку навсегда
+                print(f"Catalogue watcher error, will retry: {e!r}", flush=True)
+
+    async def check(self) -> None:
+        self.reload_media_store()
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return
+        self._signature = signature
+        await self.reload()
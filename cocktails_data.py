@@ -1,6 +1,9 @@
+import os
 from pathlib import Path
 from typing import Optional, Union
 
+import catalogue
+
 # --- Constants & Configuration ---
 CHOICES = [
     ["1. Алкогольный", "2. Безалкогольный"],
@@ -15,330 +18,44 @@ BACK_CALLBACK_NA = f"{NON_ALCOHOL_PREFIX}:back"
 FAV_ADD_PREFIX = "favadd"
 FAV_LIST_PREFIX = "favlist"
 BACK_CALLBACK_FAV = f"{FAV_LIST_PREFIX}:back"
+SEARCH_PREFIX = "srch"
+NOOP_CALLBACK = "noop"  # Кнопка-подпись (номер страницы): нажатие ничего не делает
 
-# --- Cocktail Lists ---
-ALCOHOLIC_COCKTAILS = [
-    ("negroni", "Негрони"),
-    ("old_fashioned", "Олд Фешен"),
-    ("margarita", "Маргарита"),
-    ("espresso_martini", "Espresso Martini"),
-    ("cosmopolitan", "Cosmopolitan"),
-    ("mojito", "Мохито"),
-    ("aperol_spritz", "Апероль Шприц"),
-    ("pina_colada", "Пина Колада"),
-    ("white_russian", "White Russian"),
-    ("pornstar_martini", "Pornstar Martini"),
-    ("whiskey_sour", "Whiskey Sour"),
-]
+# --- Catalogue ---
+# Сам каталог лежит в catalogue.json (или в SQLite-файле, собранном
+# `python catalogue.py compile`); путь можно переопределить CATALOGUE_PATH.
+# Имена ниже — прежний интерфейс модуля поверх загруженного каталога.
+CATALOGUE_PATH = Path(os.environ.get("CATALOGUE_PATH", Path(__file__).parent / "catalogue.json"))
 
-NON_ALCOHOLIC_COCKTAILS = [
-    ("virgin_mojito", "Мохито (безалк.)"),
-    ("pina_colada_na", "Пина Колада (безалк.)"),
-    ("virgin_margarita", "Вирджин Маргарита"),
-    ("lemonade_classic", "Лимонад классический"),
-    ("shirley_temple", "Ширли Темпл"),
-    ("virgin_mary", "Вирджин Мэри"),
-    ("strawberry_daiquiri_na", "Клубничный дайкири"),
-    ("virgin_mojito_mango", "Virgin Mojito Mango/Raspberry"),
-    ("cucumber_lemonade", "Огуречный лимонад"),
-    ("sunrise_na", "Безалкогольный Санрайз"),
-    ("iced_tea", "Айс Ти"),
-]
+# Для каждого коктейля можно указать локальный путь (относительно папки video) или URL на видео.
+# Если значение None или файл отсутствует, видео отправлено не будет.
+VideoSource = Union[str, Path]
 
-ALCOHOLIC_SLUGS = {slug for slug, _ in ALCOHOLIC_COCKTAILS}
-NON_ALCOHOLIC_SLUGS = {slug for slug, _ in NON_ALCOHOLIC_COCKTAILS}
-ALL_SLUGS = ALCOHOLIC_SLUGS | NON_ALCOHOLIC_SLUGS
+CATALOGUE: catalogue.Catalogue
+ALCOHOLIC_COCKTAILS: list[tuple[str, str]]
+NON_ALCOHOLIC_COCKTAILS: list[tuple[str, str]]
+ALCOHOLIC_SLUGS: frozenset[str]
+NON_ALCOHOLIC_SLUGS: frozenset[str]
+ALL_SLUGS: frozenset[str]
+COCKTAIL_DETAILS: dict[str, dict]
+COCKTAIL_VIDEOS: dict[str, Optional[VideoSource]]
 
-# --- Cocktail Details ---
-COCKTAIL_DETAILS = {
-    "negroni": {
-        "title": "Негрони · Negroni (IBA)",
-        "ingredients": [
-            "30 мл джина (London Dry)",
-            "30 мл Campari",
-            "30 мл сладкого красного вермута (rosso)",
-        ],
-        "method": "Стир 15–20 сек → процедить в рокc на крупный куб.",
-        "garnish": "Апельсиновая цедра.",
-        "note": "Держите вермут в холодильнике — он быстро окисляется.",
-    },
-    "old_fashioned": {
-        "title": "Олд Фешен · Old Fashioned",
-        "ingredients": [
-            "40-50 мл бурбона или ржаного виски",
-            "7,5 мл «богатого» сиропа 2:1 (или сахар + капля воды)",
-            "2 даша Angostura bitters",
-        ],
-        "method": "Собрать в рокc, добавить крупный куб, аккуратно размешать.",
-        "garnish": "Апельсиновая цедра без мякоти.",
-        "note": "Фрукты не мадлить — это «олд‑фэшенед фрут салад», а не классика.",
-    },
-    "margarita": {
-        "title": "Маргарита · Margarita (classic)",
-        "ingredients": [
-            "50 мл текилы blanco (100% агавы)",
-            "20 мл Cointreau (triple sec)",
-            "15 мл свежего сока лайма",
-            "Опция: полусоляная кромка",
-        ],
-        "method": "Шейк → двойное процеживание в охлаждённую коктейльную рюмку/кубок.",
-        "garnish": "Клин лайма.",
-        "note": "Хотите ярче — поднимите лайм до 20 мл. Tommy’s: 60 текилы + 30 лайма + 15–20 сиропа агавы без ликёра.",
-    },
-    "espresso_martini": {
-        "title": "Espresso Martini",
-        "ingredients": [
-            "45 мл водки",
-            "30 мл кофейного ликёра (например, Kahlúa)",
-            "30 мл свежего охлаждённого эспрессо",
-            "5-10 мл сахарного сиропа",
-        ],
-        "method": "Сильный шейк (чтобы поднять «крему») → двойное процеживание в рюмку.",
-        "garnish": "Три кофейных зёрнышка.",
-    },
-    "cosmopolitan": {
-        "title": "Космополитен · Cosmopolitan",
-        "ingredients": [
-            "40 мл цитрусовой водки",
-            "15 мл Cointreau",
-            "30 мл клюквенного сока",
-            "15 мл свежего лайма",
-        ],
-        "method": "Шейк → двойное процеживание в коктейльную рюмку.",
-        "garnish": "Апельсиновая цедра (можно фламбировать) или клин лайма.",
-        "note": "Если сок несладкий, добавьте 5 мл сиропа.",
-    },
-    "mojito": {
-        "title": "Мохито · Mojito (IBA)",
-        "ingredients": [
-            "50 мл белого рома",
-            "25 мл свежего лайма",
-            "15 мл сахарного сиропа (или 2 ч. л. мелкого сахара)",
-            "8–10 листьев мяты",
-            "Содовая до верха (60–90 мл)",
-        ],
-        "method": "В хайболле слегка надавить мяту с сиропом, добавить лайм и ром, засыпать дроблёный лёд, промешать, долить содовой.",
-        "garnish": "Пышный букет мяты.",
-        "note": "Соломинка у носа мяты — аромат раскрывается лучше.",
-    },
-    "aperol_spritz": {
-        "title": "Апероль Шприц · Aperol Spritz (формула 3–2–1)",
-        "ingredients": [
-            "90 мл просекко",
-            "60 мл Aperol",
-            "30 мл содовой",
-        ],
-        "method": "Сборка в винном бокале на льду.",
-        "garnish": "Ломтик апельсина.",
-        "note": "Наливайте просекко → Aperol → содовую, чтобы меньше терять газ.",
-    },
-    "pina_colada": {
-        "title": "Пина Колада · Piña Colada",
-        "ingredients": [
-            "60 мл светлого рома",
-            "90 мл ананасового сока (лучше свежего)",
-            "30 мл кокосового крема (Coco Lopez)",
-            "Опция: 5 мл лайма для баланса",
-        ],
-        "method": "Блендер: всё + ~150 г дроблёного льда → высокий бокал. Шейк: очень энергично → на дроблёный лёд.",
-        "garnish": "Ананас + коктейльная вишня или кокосовая стружка.",
-    },
-    "white_russian": {
-        "title": "White Russian",
-        "ingredients": [
-            "50 мл водки",
-            "20 мл кофейного ликёра",
-            "30 мл сливок (10–20%)",
-        ],
-        "method": "Сборка в рокc на льду, сверху флоат сливок или аккуратный «ролл».",
-        "garnish": "По желанию — тёртый мускат или какао.",
-        "note": "Без сливок это Black Russian.",
-    },
-    "pornstar_martini": {
-        "title": "Pornstar Martini",
-        "ingredients": [
-            "45 мл ванильной водки",
-            "20 мл ликёра маракуйи (Passoã)",
-            "30 мл пюре маракуйи",
-            "15 мл свежего лайма",
-            "10–15 мл ванильного сиропа",
-            "Отдельно: 45–60 мл сильно охлаждённого игристого",
-        ],
-        "method": "Шейк → двойное процеживание в рюмку; игристое подать шотом отдельно.",
-        "garnish": "Половинка маракуйи.",
-        "note": "Обычно сначала делают глоток игристого, затем коктейль.",
-    },
-    "whiskey_sour": {
-        "title": "Whiskey Sour",
-        "ingredients": [
-            "60 мл бурбона",
-            "25 мл свежего лимона",
-            "15 мл сахарного сиропа",
-            "Опция: 20–25 мл пастеризованного белка или аквафабы",
-        ],
-        "method": "Шейк → рокc на свежий лёд или купка без льда; двойное процеживание. Для пены: сначала dry shake, затем со льдом, точка Angostura.",
-        "garnish": "Цедра лимона или коктейльная вишня.",
-        "note": "Используйте пастеризованный белок для безопасности.",
-    },
-    # Безалкогольные
-    "virgin_mojito": {
-        "title": "Мохито (безалкогольный)",
-        "ingredients": [
-            "½–1 лайм",
-            "8–10 листьев мяты",
-            "20 мл сахарного сиропа (или сахар)",
-            "150–200 мл газированной воды",
-            "Дроблёный лёд",
-        ],
-        "method": "В хайболле разомни мяту с лаймом и сиропом, заполни дроблёным льдом, долей газировку и аккуратно перемешай.",
-        "garnish": "Мята и долька лайма.",
-    },
-    "pina_colada_na": {
-        "title": "Пина Колада (безалкогольная)",
-        "ingredients": [
-            "120 мл ананасового сока",
-            "60 мл кокосового молока или крема",
-            "30 мл сливок 10–20% (опционально)",
-            "Лёд",
-        ],
-        "method": "В шейкере смешай все ингредиенты со льдом, взбей 10–15 секунд, процедить в высокий бокал со льдом.",
-        "garnish": "Ананас или коктейльная вишня.",
-    },
-    "virgin_margarita": {
-        "title": "Вирджин Маргарита",
-        "ingredients": [
-            "30 мл лаймового сока",
-            "30 мл апельсинового сока",
-            "15 мл лимонного сока",
-            "15 мл сахарного сиропа",
-            "Лёд",
-        ],
-        "method": "Подготовь солёную кромку по желанию, взбей всё в шейкере со льдом и процедить в охлаждённый бокал.",
-        "garnish": "Лайм.",
-    },
-    "lemonade_classic": {
-        "title": "Lemonade Classic",
-        "ingredients": [
-            "40 мл лимонного сока",
-            "20 мл сахарного сиропа",
-            "150–200 мл газированной воды",
-            "Лимон, мята, лёд",
-        ],
-        "method": "В стакан добавь сок и сироп, наполни льдом, залей газировку, перемешай и укрась лимоном.",
-        "garnish": "Ломтик лимона и мята.",
-    },
-    "shirley_temple": {
-        "title": "Ширли Темпл",
-        "ingredients": [
-            "150 мл имбирного эля или спрайта",
-            "15 мл гренадина",
-            "Лёд",
-            "Коктейльная вишня",
-        ],
-        "method": "Наполни стакан льдом, долей гренадин, аккуратно влей газировку.",
-        "garnish": "Коктейльная вишня.",
-    },
-    "virgin_mary": {
-        "title": "Вирджин Мэри",
-        "ingredients": [
-            "150 мл томатного сока",
-            "10–15 мл лимонного сока",
-            "2–3 капли вустершира",
-            "Тобаско по вкусу",
-            "Соль, перец",
-            "Лёд",
-        ],
-        "method": "В стакане смешай сок, специи и соусы, добавь лёд и перемешай.",
-        "garnish": "Сельдерей или лимон.",
-    },
-    "strawberry_daiquiri_na": {
-        "title": "Клубничный дайкири (безалк.)",
-        "ingredients": [
-            "3/4 стакана газировки (Sprite)",
-            "5–6 ягод клубники (свежей или замороженной)",
-            "30 мл лаймового сока",
-            "20 мл сахарного сиропа",
-            "Дроблёный лёд",
-        ],
-        "method": "В блендер положи клубнику, лёд и остальные ингредиенты, измельчи до снежной текстуры, перелей в охлаждённый бокал.",
-        "garnish": "Клубника или лайм.",
-    },
-    "virgin_mojito_mango": {
-        "title": "Virgin Mojito Mango / Raspberry",
-        "ingredients": [
-            "8 листьев мяты",
-            "½ лайма",
-            "40 мл пюре манго или малины",
-            "10–15 мл сахарного сиропа",
-            "150 мл газированной воды",
-            "Дроблёный лёд",
-        ],
-        "method": "Как классический мохито: разомни мяту и лайм с сиропом, добавь пюре, лёд, долей газировку и перемешай.",
-        "garnish": "Мята и кусочек фрукта по вкусу.",
-    },
-    "cucumber_lemonade": {
-        "title": "Огуречный лимонад",
-        "ingredients": [
-            "3–4 кружочка огурца",
-            "30 мл лимонного сока",
-            "20 мл сахарного сиропа",
-            "150 мл газированной воды (можно лаймон фреш или спрайт)",
-            "Мята, лёд",
-        ],
-        "method": "Разомни огурец и мяту, добавь лимонный сок и сироп, долей газировку и лёд.",
-        "garnish": "Огурец и мята.",
-    },
-    "sunrise_na": {
-        "title": "Безалкогольный Санрайз",
-        "ingredients": [
-            "150 мл апельсинового сока",
-            "15 мл гренадина",
-            "Лёд",
-        ],
-        "method": "Налей апельсиновый сок в стакан с льдом, аккуратно влей гренадин по стенке для эффекта рассвета.",
-        "garnish": "Апельсин.",
-    },
-    "iced_tea": {
-        "title": "Айс Ти (холодный чай)",
-        "ingredients": [
-            "150 мл охлаждённого чёрного чая",
-            "20 мл лимонного сока",
-            "20 мл сахарного сиропа",
-            "Лёд",
-            "Дольки лимона",
-        ],
-        "method": "Смешай чай, сок и сироп, добавь лёд и лимон, перемешай.",
-        "garnish": "Долька лимона.",
-    },
-}
 
-# --- Video Configuration ---
-# Для каждого коктейля можно указать локальный путь (Path/str) или URL на видео.
-# Если значение None или файл отсутствует, видео отправлено не будет.
-VideoSource = Union[str, Path]
-COCKTAIL_VIDEOS: dict[str, Optional[VideoSource]] = {
-    # Path to local video with Negroni recipe
-    "negroni": "negroni.mp4",
-    "old_fashioned": "old_fashioned.mp4",
-    "margarita": "margarita.mp4",
-    "espresso_martini": "espresso_martini.mp4",
-    "cosmopolitan": "cosmopolitan.mp4",
-    "mojito": "mojito.mp4",
-    "aperol_spritz": "aperol_spritz.mp4",
-    "pina_colada": "pina_colada.mp4",
-    "white_russian": "white_russian.mp4",
-    "pornstar_martini": "pornstar_martini.mp4",
-    "whiskey_sour": "whiskey_sour.mp4",
-    # Безалкогольные
-    "virgin_mojito": "virgin_mojito.mp4",
-    "pina_colada_na": "pina_colada_na.mp4",
-    "virgin_margarita": "virgin_margarita.mp4",
-    "lemonade_classic": "lemonade_classic.mp4",
-    "shirley_temple": "shirley_temple.mp4",
-    "virgin_mary": "virgin_mary.mp4",
-    "strawberry_daiquiri_na": "strawberry_daiquiri_na.mp4",
-    "virgin_mojito_mango": "virgin_mojito_mango.mp4",
-    "cucumber_lemonade": "cucumber_lemonade.mp4",
-    "sunrise_na": "sunrise_na.mp4",
-    "iced_tea": "iced_tea.mp4",
-}
+def set_catalogue(new: catalogue.Catalogue) -> None:
+    """
+    Делает new текущим каталогом. Старые объекты не изменяются, поэтому
+    обработчик, уже получивший рецепт или список, дорабатывает со старым снимком.
+    """
+    global CATALOGUE, ALCOHOLIC_COCKTAILS, NON_ALCOHOLIC_COCKTAILS, ALCOHOLIC_SLUGS
+    global NON_ALCOHOLIC_SLUGS, ALL_SLUGS, COCKTAIL_DETAILS, COCKTAIL_VIDEOS
+    CATALOGUE = new
+    ALCOHOLIC_COCKTAILS = new.alcoholic
+    NON_ALCOHOLIC_COCKTAILS = new.non_alcoholic
+    ALCOHOLIC_SLUGS = new.alcoholic_slugs
+    NON_ALCOHOLIC_SLUGS = new.non_alcoholic_slugs
+    ALL_SLUGS = new.all_slugs
+    COCKTAIL_DETAILS = new.details
+    COCKTAIL_VIDEOS = new.videos
+
+
+set_catalogue(catalogue.load_catalogue(CATALOGUE_PATH))
@@ -3,26 +3,85 @@
 Требует установленного FFmpeg: https://ffmpeg.org/download.html
 
 Использование:
-    python compress_videos.py
+    python compress_videos.py [--jobs N] [--threads-per-job M] [--force]
+    python compress_videos.py --mode target [--target-mb 2.7] [--dry-run]
 
-Скрипт сожмёт все видео больше 3 МБ и создаст резервные копии оригиналов.
+Новые и заменённые ролики кладутся в video/, а результат попадает в
+хранилище media_store/ (см. media_store.py): оригинал и сжатая версия лежат
+там как блобы с именем по хэшу содержимого, одинаковые файлы — один раз.
+Оригинал больше 3 МБ сжимается, меньший только переупаковывается с +faststart
+(индекс moov в начале файла, чтобы воспроизведение начиналось до полной
+загрузки). Для отправляемой версии ffprobe снимает длительность, размеры и
+битрейт, а ffmpeg делает превью; всё это записывается в манифест хранилища,
+и бот отправляет это вместе с видео.
+Видео сжимаются параллельно (по умолчанию столько задач, сколько ядер), а
+каждому ffmpeg достаётся своя доля потоков, чтобы задачи не мешали друг другу.
+В манифесте запоминаются хэши и настройки сжатия: при следующем запуске
+неизменённые файлы пропускаются сразу, а новые, изменённые или сжатые с
+другими настройками — пережимаются из оригинала. Удаление файла из video/
+ролик из хранилища не убирает.
+
+Режим --mode target вместо постоянного CRF подбирает настройки под каждый
+ролик: по длительности из ffprobe считает битрейт, при котором файл уложится
+в --target-mb, при низком битрейте уменьшает ширину, чтобы на пиксель
+приходилось достаточно бит, и кодирует в два прохода. --dry-run только
+печатает выбранные настройки и прогноз размера; после настоящего прогона
+прогноз сравнивается с фактическим размером.
 """
 
+import argparse
+import json
+import os
 import subprocess
-import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
+
+from media_store import file_sha256, store
 
 # Исправляем кодировку для Windows
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
 # Настройки
-VIDEO_DIR = Path(__file__).parent / "video"
-BACKUP_DIR = Path(__file__).parent / "video_backup"
+VIDEO_DIR = Path(__file__).parent / "video"  # Сюда кладут новые ролики
+THUMB_SIZE = 320  # Telegram: превью JPEG не больше 320x320 и 200 КБ
+THUMB_AT_SECONDS = 1.0  # Кадр для превью
 MAX_SIZE_MB = 3  # Сжимать файлы больше этого размера
 TARGET_WIDTH = 720  # Целевая ширина видео
 CRF = 28  # Качество (18-28, чем выше - меньше размер, ниже качество)
+PRESET = "fast"
+AUDIO_BITRATE = "128k"
+
+# Режим target: размер, в который надо уложиться, и как к нему подбираться
+TARGET_SIZE_MB = MAX_SIZE_MB * 0.9  # Запас, чтобы результат точно был меньше MAX_SIZE_MB
+MUX_OVERHEAD = 0.02  # Доля контейнера mp4 в размере файла
+MIN_VIDEO_KBPS = 250  # Ниже видео превращается в кашу при любой ширине
+MIN_BITS_PER_PIXEL = 0.06  # Меньше бит на пиксель кадра — уменьшаем ширину
+WIDTH_LADDER = (720, 540, 480, 360)  # Ширины, из которых выбираем (не больше TARGET_WIDTH и исходной)
+
+# Всё, что влияет на результат: при изменении файлы пережимаются из оригиналов.
+# Для режима target main() дополняет словарь его параметрами.
+SETTINGS = {
+    "max_size_mb": MAX_SIZE_MB,
+    "width": TARGET_WIDTH,
+    "crf": CRF,
+    "preset": PRESET,
+    "audio_bitrate": AUDIO_BITRATE,
+}
+
+
+@dataclass
+class EncodePlan:
+    """Настройки сжатия одного ролика: CRF (video_kbps None) или двухпроходный битрейт."""
+
+    width: int
+    video_kbps: Optional[int] = None
+    predicted_mb: Optional[float] = None
 
 
 def get_file_size_mb(path: Path) -> float:
@@ -30,23 +89,30 @@ def get_file_size_mb(path: Path) -> float:
     return path.stat().st_size / (1024 * 1024)
 
 
-def compress_video(input_path: Path, output_path: Path) -> bool:
-    """Сжимает видео с помощью FFmpeg."""
+def compress_video(
+    input_path: Path, output_path: Path, threads: int = 0, encode: Optional[EncodePlan] = None
+) -> bool:
+    """Сжимает видео с помощью FFmpeg. threads=0 — ffmpeg сам выбирает число потоков."""
+    if encode is not None and encode.video_kbps is not None:
+        return compress_video_two_pass(input_path, output_path, threads, encode)
+    width = encode.width if encode is not None else TARGET_WIDTH
     cmd = [
         "ffmpeg",
         "-i", str(input_path),
         "-vcodec", "libx264",
         "-crf", str(CRF),
-        "-preset", "fast",
-        "-vf", f"scale={TARGET_WIDTH}:-2",
+        "-preset", PRESET,
+        "-vf", f"scale={width}:-2",
         "-acodec", "aac",
-        "-b:a", "128k",
+        "-b:a", AUDIO_BITRATE,
+        "-movflags", "+faststart",
+        "-threads", str(threads),
         "-y",  # Перезаписывать без вопросов
         str(output_path)
     ]
-    
+
     try:
-        result = subprocess.run(
+        subprocess.run(
             cmd,
             capture_output=True,
             text=True,
@@ -54,64 +120,390 @@ def compress_video(input_path: Path, output_path: Path) -> bool:
         )
         return True
     except subprocess.CalledProcessError as e:
-        print(f"  [ERROR] {e.stderr}")
+        print(f"  [ERROR] {input_path.name}: {e.stderr}")
         return False
     except FileNotFoundError:
         print("  [ERROR] FFmpeg не найден! Установите его: https://ffmpeg.org/download.html")
         return False
 
 
+def compress_video_two_pass(input_path: Path, output_path: Path, threads: int, encode: EncodePlan) -> bool:
+    """Два прохода libx264 на заданный битрейт: первый собирает статистику, второй кодирует."""
+    kbps = encode.video_kbps
+    common = [
+        "-vcodec", "libx264",
+        "-preset", PRESET,
+        "-b:v", f"{kbps}k",
+        "-vf", f"scale={encode.width}:-2",
+        "-threads", str(threads),
+    ]
+    # Свой каталог на задачу: параллельные проходы не должны делить файл статистики
+    with tempfile.TemporaryDirectory() as tmp:
+        log = str(Path(tmp) / "pass")
+        first = ["ffmpeg", "-y", "-i", str(input_path), *common, "-pass", "1", "-passlogfile", log, "-an", "-f", "mp4", os.devnull]
+        second = [
+            "ffmpeg", "-i", str(input_path), *common,
+            "-maxrate", f"{kbps * 3 // 2}k", "-bufsize", f"{kbps * 2}k",
+            "-pass", "2", "-passlogfile", log,
+            "-acodec", "aac", "-b:a", AUDIO_BITRATE,
+            "-movflags", "+faststart",
+            "-y", str(output_path),
+        ]
+        return (
+            _run_ffmpeg_tool(first, input_path.name) is not None
+            and _run_ffmpeg_tool(second, input_path.name) is not None
+        )
+
+
+def _kbps(bitrate: str) -> int:
+    return int(bitrate.rstrip("kK"))
+
+
+def plan_target_encode(info: dict, target_mb: float) -> EncodePlan:
+    """Битрейт и ширина, при которых ролик с параметрами info уложится в target_mb."""
+    duration = max(info["duration"], 1.0)
+    audio_kbps = _kbps(AUDIO_BITRATE)
+    budget_kbps = target_mb * 1024 * 1024 * 8 / 1000 / duration / (1 + MUX_OVERHEAD)
+    video_kbps = max(MIN_VIDEO_KBPS, int(budget_kbps - audio_kbps))
+    # Поднимать битрейт выше исходного бессмысленно
+    if info.get("bitrate"):
+        video_kbps = min(video_kbps, max(MIN_VIDEO_KBPS, info["bitrate"] // 1000 - audio_kbps))
+
+    src_width, src_height = info.get("width") or TARGET_WIDTH, info.get("height") or TARGET_WIDTH
+    fps = info.get("fps") or 30.0
+    widths = [w for w in WIDTH_LADDER if w <= min(TARGET_WIDTH, src_width)] or [min(TARGET_WIDTH, src_width)]
+    width = widths[-1]
+    for candidate in widths:
+        height = src_height * candidate / src_width
+        if video_kbps * 1000 / (candidate * height * fps) >= MIN_BITS_PER_PIXEL:
+            width = candidate
+            break
+
+    predicted_mb = (video_kbps + audio_kbps) * 1000 / 8 * duration * (1 + MUX_OVERHEAD) / (1024 * 1024)
+    return EncodePlan(width, video_kbps, predicted_mb)
+
+
+def size_limit_mb() -> float:
+    """Размер, больше которого ролик сжимается: в режиме target — сам target_mb."""
+    return SETTINGS["target_mb"] if SETTINGS.get("mode") == "target" else MAX_SIZE_MB
+
+
+def plan_encode(source_path: Path) -> EncodePlan:
+    """Настройки сжатия по текущему режиму; если ffprobe не сработал — обычный CRF."""
+    if SETTINGS.get("mode") != "target":
+        return EncodePlan(TARGET_WIDTH)
+    info = probe_video(source_path)
+    if info is None:
+        return EncodePlan(TARGET_WIDTH)
+    return plan_target_encode(info, SETTINGS["target_mb"])
+
+
+def _run_ffmpeg_tool(cmd: list[str], name: str) -> Optional[str]:
+    """Запускает ffmpeg/ffprobe; возвращает stdout или None при ошибке."""
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"  [ERROR] {name}: {e.stderr}")
+        return None
+    except FileNotFoundError:
+        print(f"  [ERROR] {cmd[0]} не найден! Установите FFmpeg: https://ffmpeg.org/download.html")
+        return None
+    return result.stdout
+
+
+def remux_faststart(input_path: Path, output_path: Path) -> bool:
+    """Переносит индекс moov в начало файла без перекодирования."""
+    cmd = ["ffmpeg", "-i", str(input_path), "-c", "copy", "-map", "0", "-movflags", "+faststart", "-y", str(output_path)]
+    return _run_ffmpeg_tool(cmd, input_path.name) is not None
+
+
+def _fps(rate: str) -> float:
+    """avg_frame_rate вида «30000/1001»."""
+    numerator, _, denominator = rate.partition("/")
+    try:
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_video(video_path: Path) -> Optional[dict]:
+    """Длительность (с), ширина, высота, частота кадров и битрейт (бит/с) первой видеодорожки."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,avg_frame_rate:format=duration,bit_rate",
+        "-of", "json",
+        str(video_path),
+    ]
+    output = _run_ffmpeg_tool(cmd, video_path.name)
+    if output is None:
+        return None
+    info = json.loads(output)
+    stream = (info.get("streams") or [{}])[0]
+    fmt = info.get("format", {})
+    return {
+        "duration": float(fmt.get("duration") or 0),
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+        "fps": _fps(stream.get("avg_frame_rate") or ""),
+        "bitrate": int(fmt.get("bit_rate") or 0),
+    }
+
+
+def make_thumbnail(video_path: Path, thumb_path: Path) -> bool:
+    cmd = [
+        "ffmpeg",
+        "-ss", str(THUMB_AT_SECONDS),
+        "-i", str(video_path),
+        "-frames:v", "1",
+        "-vf", f"scale={THUMB_SIZE}:{THUMB_SIZE}:force_original_aspect_ratio=decrease",
+        "-q:v", "5",
+        "-y",
+        str(thumb_path),
+    ]
+    return _run_ffmpeg_tool(cmd, thumb_path.name) is not None
+
+
+def describe_video(sha: str) -> Optional[dict]:
+    """
+    Снимает метаданные блоба и кладёт в хранилище его превью.
+    Возвращает метаданные (они же записываются в манифест) или None при ошибке.
+    """
+    video_path = store.blob_path(sha)
+    info = probe_video(video_path)
+    if info is None:
+        return None
+    # Telegram принимает длительность в целых секундах
+    info["duration"] = round(info["duration"])
+    del info["fps"]
+    with tempfile.TemporaryDirectory() as tmp:
+        thumb_path = Path(tmp) / f"{sha}.jpg"
+        if make_thumbnail(video_path, thumb_path):
+            info["thumbnail"] = store.put(thumb_path)
+    store.set_meta(sha, info)
+    return info
+
+
+def needs_describe(sha: str) -> bool:
+    meta = store.meta(sha)
+    thumbnail = meta.get("thumbnail")
+    return not meta or thumbnail is None or not store.blob_path(thumbnail).exists()
+
+
+def _stat_key(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+@dataclass
+class Job:
+    """Что сделать с одним видео."""
+
+    name: str
+    source_path: Path  # Откуда сжимать: новый файл из video/ или оригинал в хранилище
+    source_sha256: str
+    new: bool  # Оригинала ещё нет в хранилище
+    inbox: Optional[dict] = None  # Размер, время и хэш файла в video/ — записываются после успешного сжатия
+
+
+def plan(video_path: Path, force: bool) -> tuple[Optional[Job], str]:
+    """
+    Решает судьбу файла из video/: (задача или None, причина).
+    Хэш считается только если размер или время изменения не совпали с манифестом.
+    """
+    entry = store.videos.get(video_path.name, {})
+    size, mtime_ns = _stat_key(video_path)
+    seen = entry.get("inbox") or {}
+    if (seen.get("size"), seen.get("mtime_ns")) == (size, mtime_ns):
+        digest = seen["sha256"]
+    else:
+        digest = file_sha256(video_path)
+    inbox = {"size": size, "mtime_ns": mtime_ns, "sha256": digest}
+
+    # Файл в video/ тот же, что в прошлый раз, или это один из вариантов в хранилище.
+    # Без оригинала (прошлое сжатие не удалось) файл всё ещё новый
+    known = digest == seen.get("sha256") or digest in (entry.get("original"), entry.get("compressed"))
+    if not known or not entry.get("original"):
+        # Новый или заменённый файл — это и есть оригинал. inbox запишет run_job
+        # после успеха, иначе неудачная попытка выглядела бы как уже сделанная
+        return Job(video_path.name, video_path, digest, new=True, inbox=inbox), "новый или изменён"
+    if seen != inbox:
+        store.update_video(video_path.name, inbox=inbox)
+    original = entry["original"]
+    if entry.get("compressed") and entry.get("settings") == SETTINGS and not force:
+        return None, "не изменился"
+    reason = "новые настройки" if entry.get("settings") else "нет версии для отправки"
+    return Job(video_path.name, store.blob_path(original), original, new=False), reason
+
+
+@dataclass
+class JobResult:
+    job: Job
+    compressed: Optional[str]  # Хэш отправляемой версии; None — не получилось
+    size_mb: float
+    new_size_mb: float
+    seconds: float
+    encode: Optional[EncodePlan]  # None — только faststart, без сжатия
+
+
+def run_job(job: Job, threads: int) -> JobResult:
+    """Сжимает (или переупаковывает) одно видео и кладёт результат в хранилище."""
+    started = time.perf_counter()
+    if job.new:
+        store.put(job.source_path, job.source_sha256)
+    source_path = store.blob_path(job.source_sha256)
+    size_mb = get_file_size_mb(source_path)
+    encode = plan_encode(source_path) if size_mb > size_limit_mb() else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        temp_path = Path(tmp) / job.name
+        if encode is not None:
+            ok = compress_video(source_path, temp_path, threads, encode)
+        else:
+            ok = remux_faststart(source_path, temp_path)
+        if not ok:
+            return JobResult(job, None, size_mb, size_mb, time.perf_counter() - started, encode)
+        new_size_mb = get_file_size_mb(temp_path)
+        compressed = store.put(temp_path)
+
+    fields = {"inbox": job.inbox} if job.inbox is not None else {}
+    store.update_video(job.name, original=job.source_sha256, compressed=compressed, settings=SETTINGS, **fields)
+    return JobResult(job, compressed, size_mb, new_size_mb, time.perf_counter() - started, encode)
+
+
+def print_dry_run(jobs: list[Job]) -> None:
+    """Печатает, с какими настройками и в какой размер сжался бы каждый ролик."""
+    print(f"\n[DRY RUN] Режим {SETTINGS.get('mode', 'crf')}, сжатие не выполняется")
+    for job in jobs:
+        size_mb = get_file_size_mb(job.source_path)
+        if size_mb <= size_limit_mb():
+            print(f"  {job.name}: {size_mb:.1f} MB - только faststart")
+            continue
+        encode = plan_encode(job.source_path)
+        if encode.video_kbps is None:
+            print(f"  {job.name}: {size_mb:.1f} MB, CRF {CRF}, ширина {encode.width} - размер заранее неизвестен")
+        else:
+            print(
+                f"  {job.name}: {size_mb:.1f} MB -> прогноз {encode.predicted_mb:.2f} MB "
+                f"(видео {encode.video_kbps} кбит/с, ширина {encode.width})"
+            )
+
+
 def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Сжатие видео коктейлей")
+    parser.add_argument("--jobs", type=int, default=cpus, help=f"параллельных ffmpeg (по умолчанию {cpus})")
+    parser.add_argument("--threads-per-job", type=int, default=0, help="потоков на один ffmpeg (по умолчанию ядра / jobs)")
+    parser.add_argument("--force", action="store_true", help="пережать всё, не глядя в манифест")
+    parser.add_argument("--mode", choices=("crf", "target"), default="crf", help="постоянный CRF или подбор под размер")
+    parser.add_argument("--target-mb", type=float, default=TARGET_SIZE_MB, help="целевой размер для --mode target")
+    parser.add_argument("--dry-run", action="store_true", help="только показать выбранные настройки и прогноз")
+    args = parser.parse_args()
+    if args.mode == "target":
+        SETTINGS.update(mode="target", target_mb=args.target_mb)
+        del SETTINGS["crf"]
+
     if not VIDEO_DIR.exists():
         print(f"[ERROR] Папка {VIDEO_DIR} не найдена!")
         return
 
-    # Создаём папку для резервных копий
-    BACKUP_DIR.mkdir(exist_ok=True)
-    
-    videos = list(VIDEO_DIR.glob("*.mp4"))
+    videos = sorted(path for path in VIDEO_DIR.glob("*.mp4") if not path.name.endswith(".temp.mp4"))
     print(f"[INFO] Найдено {len(videos)} видео в {VIDEO_DIR}\n")
-    
-    compressed_count = 0
+
+    started = time.perf_counter()
+    jobs: list[Job] = []
     skipped_count = 0
-    
-    for video_path in sorted(videos):
-        size_mb = get_file_size_mb(video_path)
-        
-        if size_mb <= MAX_SIZE_MB:
-            print(f"[SKIP] {video_path.name}: {size_mb:.1f} MB - уже маленький")
+    for video_path in videos:
+        job, reason = plan(video_path, args.force)
+        if job is None:
+            print(f"[SKIP] {video_path.name}: {get_file_size_mb(video_path):.1f} MB - {reason}")
             skipped_count += 1
-            continue
-        
-        print(f"[COMPRESS] {video_path.name}: {size_mb:.1f} MB - сжимаем...")
-        
-        # Создаём резервную копию
-        backup_path = BACKUP_DIR / video_path.name
-        if not backup_path.exists():
-            shutil.copy2(video_path, backup_path)
-            print(f"  [BACKUP] {backup_path}")
-        
-        # Временный файл для сжатого видео
-        temp_path = video_path.with_suffix(".temp.mp4")
-        
-        if compress_video(video_path, temp_path):
-            new_size_mb = get_file_size_mb(temp_path)
-            
-            # Заменяем оригинал сжатым
-            temp_path.replace(video_path)
-            
-            reduction = ((size_mb - new_size_mb) / size_mb) * 100
-            print(f"  [OK] Сжато: {size_mb:.1f} MB -> {new_size_mb:.1f} MB (-{reduction:.0f}%)")
-            compressed_count += 1
         else:
-            # Удаляем временный файл при ошибке
-            if temp_path.exists():
-                temp_path.unlink()
-    
+            print(f"[COMPRESS] {video_path.name}: {get_file_size_mb(job.source_path):.1f} MB - {reason}")
+            jobs.append(job)
+
+    if args.dry_run:
+        print_dry_run(jobs)
+        return
+
+    workers = max(1, min(args.jobs, len(jobs) or 1))
+    threads = args.threads_per_job or max(1, cpus // workers)
+    if jobs:
+        print(f"\n[INFO] Сжимаем {len(jobs)} видео: {workers} задач x {threads} потоков ffmpeg")
+
+    compressed_count = 0
+    remuxed_count = 0
+    failed_count = 0
+    input_mb = output_mb = encode_seconds = 0.0
+    prediction_errors: list[float] = []
+    over_target = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, job, threads) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            encode_seconds += result.seconds
+            if result.compressed is None:
+                failed_count += 1
+                continue
+            size_mb, new_size_mb = result.size_mb, result.new_size_mb
+            if result.encode is None:
+                print(f"  [FASTSTART] {result.job.name}: {new_size_mb:.1f} MB за {result.seconds:.1f} с")
+                remuxed_count += 1
+                continue
+            input_mb += size_mb
+            output_mb += new_size_mb
+            reduction = ((size_mb - new_size_mb) / size_mb) * 100 if size_mb else 0
+            predicted = ""
+            if result.encode.predicted_mb:
+                predicted = f", прогноз {result.encode.predicted_mb:.2f} MB"
+                prediction_errors.append(abs(new_size_mb - result.encode.predicted_mb) / result.encode.predicted_mb)
+            if new_size_mb > size_limit_mb():
+                over_target += 1
+            print(
+                f"  [OK] {result.job.name}: {size_mb:.1f} MB -> {new_size_mb:.1f} MB "
+                f"(-{reduction:.0f}%{predicted}) за {result.seconds:.1f} с"
+            )
+            compressed_count += 1
+
+    # Метаданные и превью — для отправляемых версий, у которых их ещё нет
+    pending = sorted({
+        sha for sha in (store.served(path.name) for path in videos)
+        if sha and needs_describe(sha)
+    })
+    if pending:
+        print(f"\n[INFO] Метаданные и превью: {len(pending)} видео")
+    with ThreadPoolExecutor(max_workers=max(1, min(args.jobs, len(pending) or 1))) as pool:
+        describe_futures = {pool.submit(describe_video, sha): sha for sha in pending}
+        for future in as_completed(describe_futures):
+            info = future.result()
+            if info is None:
+                failed_count += 1
+                continue
+            print(
+                f"  [META] {describe_futures[future][:12]}: {info['width']}x{info['height']}, {info['duration']} с, "
+                f"{info['bitrate'] // 1000} кбит/с, превью: {'есть' if 'thumbnail' in info else 'нет'}"
+            )
+
+    store.save()
+    wall = time.perf_counter() - started
+
     print(f"\n[RESULT]")
     print(f"   Сжато: {compressed_count}")
+    if remuxed_count:
+        print(f"   Только faststart: {remuxed_count}")
     print(f"   Пропущено: {skipped_count}")
-    print(f"   Резервные копии: {BACKUP_DIR}")
+    if failed_count:
+        print(f"   Ошибок: {failed_count}")
+    if over_target:
+        print(f"   Больше {size_limit_mb():g} MB после сжатия: {over_target}")
+    if prediction_errors:
+        print(f"   Отклонение от прогноза размера: в среднем {sum(prediction_errors) / len(prediction_errors) * 100:.0f}%")
+    print(f"   Время: {wall:.1f} с (сумма по задачам {encode_seconds:.1f} с)")
+    if compressed_count and wall:
+        print(f"   Пропускная способность: {input_mb / wall:.1f} MB/с исходного видео, {compressed_count / wall:.2f} видео/с")
+        print(f"   Объём: {input_mb:.1f} MB -> {output_mb:.1f} MB")
+    stored_mb = sum(blob["size"] for blob in store.blobs.values()) / (1024 * 1024)
+    print(f"   Хранилище: {len(store.blobs)} файлов, {stored_mb:.1f} MB ({store.root})")
 
 
 if __name__ == "__main__":
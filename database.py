@@ -1,12 +1,85 @@
+import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from typing import Set
 
-DB_PATH = Path(__file__).parent / "cocktails.db"
+# WAL keeps committed data in the -wal/-shm files next to the database until a
+# checkpoint, so in Docker DB_PATH points into a mounted directory, not a single mounted file
+DB_PATH = Path(os.environ.get("DB_PATH", Path(__file__).parent / "cocktails.db"))
+
+# --- Connection Management ---
+# Each thread keeps one long-lived connection instead of reconnecting per call.
+# A connection is only ever used by the thread that opened it; check_same_thread
+# is disabled solely so close_connections() can close them from the main thread.
+
+SYNCHRONOUS = "NORMAL"  # WAL + NORMAL: no fsync per commit, still crash-safe
+CACHED_STATEMENTS = 64  # Prepared statements kept per connection
+CACHE_SIZE_KIB = 8 * 1024  # Page cache size (PRAGMA cache_size, in KiB)
+MMAP_SIZE = 64 * 1024 * 1024  # Memory-mapped I/O window in bytes
+
+_local = threading.local()
+_connections: list[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_generation = 0  # Bumped by close_connections() so other threads reopen lazily
+
+
+def _configure(conn: sqlite3.Connection) -> None:
+    """Apply performance PRAGMAs to a freshly opened connection."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=5000")
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Return the calling thread's connection to DB_PATH, opening it on first use.
+    The connection is reopened if DB_PATH has changed or close_connections() ran.
+    """
+    conn = getattr(_local, "conn", None)
+    key = (DB_PATH, _generation)
+    if conn is not None and _local.key == key:
+        return conn
+    if conn is not None:
+        _close(conn)
+
+    conn = sqlite3.connect(DB_PATH, cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+    _configure(conn)
+    _local.conn = conn
+    _local.key = key
+    with _connections_lock:
+        _connections.append(conn)
+    return conn
+
+
+def _close(conn: sqlite3.Connection) -> None:
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    conn.close()
+
+
+def close_connections() -> None:
+    """Close every connection opened by this module (e.g. on shutdown or in benchmarks)."""
+    global _generation
+    with _connections_lock:
+        conns = list(_connections)
+        _connections.clear()
+        _generation += 1
+    for conn in conns:
+        conn.close()
+    _local.conn = None
+
 
 def init_db() -> None:
     """Initialize the SQLite database and create tables if they don't exist."""
-    with sqlite3.connect(DB_PATH) as conn:
+    conn = get_connection()
+    with conn:
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS favorites (
@@ -21,78 +94,389 @@ def init_db() -> None:
                 file_id TEXT NOT NULL
             )
         """)
-        conn.commit()
+    load_media_cache()
+
+
+# --- Write-Behind Buffer ---
+# While the buffer is running (start_write_behind), favorite changes and media
+# file_ids are recorded in memory and committed by a background thread in
+# batched transactions. Repeated toggles of the same (user, slug) collapse into
+# one final state. Favorite reads consult the pending and in-flight overlays, so
+# a user always sees their own writes even before the batch is committed.
+# Without the buffer (scripts, benchmarks) every write is committed directly.
+
+WRITE_BATCH_SIZE = 256  # Flush as soon as this many changes are pending
+WRITE_FLUSH_INTERVAL = 0.5  # Seconds between time-based flushes
+
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()
+# user_id -> {slug: is_favorite}; media key -> file_id (None deletes the row).
+# The "flushing" dicts are the batch being committed right now.
+_pending_favorites: dict[int, dict[str, bool]] = {}
+_flushing_favorites: dict[int, dict[str, bool]] = {}
+_pending_media: dict[str, str | None] = {}
+_flushing_media: dict[str, str | None] = {}
+_pending_count = 0
+# Bumped (under _pending_lock) whenever a flushing batch is retired, so readers
+# can tell that a batch they did not see in SQLite has left the overlays
+_flush_generation = 0
+_flush_wakeup = threading.Event()
+_flush_stop = threading.Event()
+_flusher: threading.Thread | None = None
+
+
+def _overlay_favorite(user_id: int, slug: str) -> bool | None:
+    """Return the buffered state of a favorite, or None if nothing is pending. Caller holds _pending_lock."""
+    for overlay in (_pending_favorites, _flushing_favorites):
+        state = overlay.get(user_id, {}).get(slug)
+        if state is not None:
+            return state
+    return None
+
+
+def _mark_pending() -> None:
+    """Count one buffered change and wake the flusher once the batch is full. Caller holds _pending_lock."""
+    global _pending_count
+    _pending_count += 1
+    if _pending_count >= WRITE_BATCH_SIZE:
+        _flush_wakeup.set()
+
+
+def flush_writes() -> int:
+    """Commit all buffered writes in a single transaction. Returns the number of rows written."""
+    global _pending_favorites, _flushing_favorites, _pending_media, _flushing_media, _pending_count
+    global _flush_generation
+    with _flush_lock:
+        with _pending_lock:
+            if not _pending_favorites and not _pending_media:
+                return 0
+            _flushing_favorites, _pending_favorites = _pending_favorites, {}
+            _flushing_media, _pending_media = _pending_media, {}
+            _pending_count = 0
+
+        added = [(u, s) for u, slugs in _flushing_favorites.items() for s, on in slugs.items() if on]
+        removed = [(u, s) for u, slugs in _flushing_favorites.items() for s, on in slugs.items() if not on]
+        media = [(key, file_id) for key, file_id in _flushing_media.items() if file_id is not None]
+        dropped = [(key,) for key, file_id in _flushing_media.items() if file_id is None]
+        try:
+            with get_connection() as conn:
+                conn.executemany("INSERT OR IGNORE INTO favorites (user_id, slug) VALUES (?, ?)", added)
+                conn.executemany("DELETE FROM favorites WHERE user_id = ? AND slug = ?", removed)
+                conn.executemany("INSERT OR REPLACE INTO video_cache (slug, file_id) VALUES (?, ?)", media)
+                conn.executemany("DELETE FROM video_cache WHERE slug = ?", dropped)
+        except sqlite3.Error:
+            # Put the batch back (newer pending changes win) so nothing is lost
+            with _pending_lock:
+                for user_id, slugs in _flushing_favorites.items():
+                    for slug, state in slugs.items():
+                        _pending_favorites.setdefault(user_id, {}).setdefault(slug, state)
+                for key, file_id in _flushing_media.items():
+                    _pending_media.setdefault(key, file_id)
+                _pending_count += len(added) + len(removed) + len(_flushing_media)
+                _flushing_favorites = {}
+                _flushing_media = {}
+                _flush_generation += 1
+            raise
+
+        with _pending_lock:
+            _flushing_favorites = {}
+            _flushing_media = {}
+            _flush_generation += 1
+        return len(added) + len(removed) + len(media) + len(dropped)
+
+
+def _flush_loop() -> None:
+    while not _flush_stop.is_set():
+        _flush_wakeup.wait(WRITE_FLUSH_INTERVAL)
+        _flush_wakeup.clear()
+        try:
+            flush_writes()
+        except sqlite3.Error as e:
+            print(f"[DB] Write-behind flush failed, will retry: {e}", flush=True)
+
+
+def start_write_behind() -> None:
+    """Start buffering writes and flushing them from a background thread."""
+    global _flusher
+    if _flusher is not None:
+        return
+    _flush_stop.clear()
+    _flusher = threading.Thread(target=_flush_loop, name="db-flush", daemon=True)
+    _flusher.start()
+
+
+def stop_write_behind() -> None:
+    """Stop the background flusher and commit everything still pending."""
+    global _flusher
+    if _flusher is None:
+        return
+    _flush_stop.set()
+    _flush_wakeup.set()
+    _flusher.join()
+    _flusher = None
+    flush_writes()
+
+
+# --- Favorites Cache ---
+# Bounded LRU of each active user's favorites set. Entries expire after
+# FAVORITES_CACHE_TTL seconds and are updated in place by every favorite write,
+# so recipe views for hot users never touch SQLite.
+
+FAVORITES_CACHE_CAPACITY = 10_000  # Users kept in memory
+FAVORITES_CACHE_TTL = 600.0  # Seconds before an entry is reloaded from the database
+
+_cache_lock = threading.Lock()
+_favorites_cache: "OrderedDict[int, tuple[float, Set[str]]]" = OrderedDict()
+# user_id -> token of the load in progress; a write for that user clears it so a
+# load that raced with the write does not put a stale set into the cache
+_cache_loading: dict[int, object] = {}
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+
+def _cache_get(user_id: int) -> Set[str] | None:
+    """Return the cached favorites set (not a copy) or None on a miss."""
+    with _cache_lock:
+        entry = _favorites_cache.get(user_id)
+        if entry is None:
+            _cache_stats["misses"] += 1
+            return None
+        expires_at, favorites = entry
+        if expires_at < time.monotonic():
+            del _favorites_cache[user_id]
+            _cache_stats["expirations"] += 1
+            _cache_stats["misses"] += 1
+            return None
+        _favorites_cache.move_to_end(user_id)
+        _cache_stats["hits"] += 1
+        return favorites
+
+
+def _cache_peek(user_id: int, slug: str) -> bool | None:
+    """Membership check against the cache without touching LRU order or counters."""
+    with _cache_lock:
+        entry = _favorites_cache.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return slug in entry[1]
+
+
+def _cache_load(user_id: int) -> Set[str]:
+    """Load a user's favorites from the database and cache them unless a write raced the load."""
+    token = object()
+    with _cache_lock:
+        _cache_loading[user_id] = token
+    favorites = _load_user_favorites(user_id)
+    with _cache_lock:
+        if _cache_loading.get(user_id) is token:
+            del _cache_loading[user_id]
+            _favorites_cache[user_id] = (time.monotonic() + FAVORITES_CACHE_TTL, favorites)
+            _favorites_cache.move_to_end(user_id)
+            while len(_favorites_cache) > FAVORITES_CACHE_CAPACITY:
+                _favorites_cache.popitem(last=False)
+                _cache_stats["evictions"] += 1
+    return favorites
+
+
+def _cache_apply(user_id: int, slug: str, state: bool) -> None:
+    """Reflect a favorite change in the cached set, if the user is cached."""
+    with _cache_lock:
+        if user_id in _cache_loading:
+            _cache_loading[user_id] = None
+        entry = _favorites_cache.get(user_id)
+        if entry is None:
+            return
+        if state:
+            entry[1].add(slug)
+        else:
+            entry[1].discard(slug)
+
+
+def clear_favorites_cache() -> None:
+    """Drop all cached favorites (e.g. after editing the database by hand)."""
+    with _cache_lock:
+        _favorites_cache.clear()
+        _cache_loading.clear()
+
+
+def favorites_cache_stats() -> dict[str, int]:
+    """Return hit/miss/eviction/expiration counters and the current size, for monitoring."""
+    with _cache_lock:
+        return {**_cache_stats, "size": len(_favorites_cache), "capacity": FAVORITES_CACHE_CAPACITY}
+
+
+# --- Favorites ---
+
+def _set_favorite(user_id: int, slug: str, state: bool | None) -> tuple[bool, bool]:
+    """
+    Set favorite status to `state` (None toggles it).
+    Returns (new status, whether anything changed).
+    Direct mode uses one transaction whose first statement takes the write lock,
+    so concurrent toggles cannot interleave between the check and the change.
+    """
+    if _flusher is not None:
+        with _pending_lock:
+            current = _overlay_favorite(user_id, slug)
+            if current is None:
+                current = _cache_peek(user_id, slug)
+            if current is None:
+                current = _is_favorite_db(user_id, slug)
+            new_state = (not current) if state is None else state
+            if new_state != current:
+                _pending_favorites.setdefault(user_id, {})[slug] = new_state
+                _mark_pending()
+            _cache_apply(user_id, slug, new_state)
+        return new_state, new_state != current
+
+    with get_connection() as conn:
+        new_state, changed = False, False
+        if state is not False:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO favorites (user_id, slug) VALUES (?, ?)", (user_id, slug)
+            )
+            new_state, changed = True, cursor.rowcount > 0
+        if state is False or (state is None and not changed):
+            cursor = conn.execute("DELETE FROM favorites WHERE user_id = ? AND slug = ?", (user_id, slug))
+            new_state, changed = False, cursor.rowcount > 0
+    _cache_apply(user_id, slug, new_state)
+    return new_state, changed
 
 def add_favorite(user_id: int, slug: str) -> bool:
     """
     Add a cocktail to favorites.
     Returns True if added, False if already existed.
     """
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO favorites (user_id, slug) VALUES (?, ?)", (user_id, slug))
-            conn.commit()
-            return True
-    except sqlite3.IntegrityError:
-        return False
+    return _set_favorite(user_id, slug, True)[1]
 
 def remove_favorite(user_id: int, slug: str) -> bool:
     """
     Remove a cocktail from favorites.
     Returns True if removed, False if it wasn't there.
     """
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM favorites WHERE user_id = ? AND slug = ?", (user_id, slug))
-        conn.commit()
-        return cursor.rowcount > 0
+    return _set_favorite(user_id, slug, False)[1]
 
 def toggle_favorite(user_id: int, slug: str) -> bool:
     """
     Toggles favorite status.
     Returns True if it is now a favorite (added), False if removed.
     """
-    if is_favorite(user_id, slug):
-        remove_favorite(user_id, slug)
-        return False
-    else:
-        add_favorite(user_id, slug)
-        return True
+    return _set_favorite(user_id, slug, None)[0]
 
 def get_user_favorites(user_id: int) -> Set[str]:
     """Return a set of slugs that are in the user's favorites."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT slug FROM favorites WHERE user_id = ?", (user_id,))
-        rows = cursor.fetchall()
-        return {row[0] for row in rows}
+    favorites = _cache_get(user_id)
+    if favorites is None:
+        favorites = _cache_load(user_id)
+    return set(favorites)
+
+def _load_user_favorites(user_id: int) -> Set[str]:
+    """
+    Read a user's favorites from the database, with buffered writes applied.
+    If a batch is committed and dropped from the overlays between the SELECT and
+    the merge, the SELECT may predate it and the merge would miss it, so read again.
+    """
+    while True:
+        with _pending_lock:
+            generation = _flush_generation
+        cursor = get_connection().execute("SELECT slug FROM favorites WHERE user_id = ?", (user_id,))
+        favorites = {row[0] for row in cursor.fetchall()}
+        with _pending_lock:
+            if generation != _flush_generation:
+                continue
+            for overlay in (_flushing_favorites, _pending_favorites):
+                for slug, state in overlay.get(user_id, {}).items():
+                    if state:
+                        favorites.add(slug)
+                    else:
+                        favorites.discard(slug)
+        return favorites
+
+def _is_favorite_db(user_id: int, slug: str) -> bool:
+    cursor = get_connection().execute(
+        "SELECT 1 FROM favorites WHERE user_id = ? AND slug = ?", (user_id, slug)
+    )
+    return cursor.fetchone() is not None
 
 def is_favorite(user_id: int, slug: str) -> bool:
     """Check if a slug is in user's favorites."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM favorites WHERE user_id = ? AND slug = ?", (user_id, slug))
-        return cursor.fetchone() is not None
+    favorites = _cache_get(user_id)
+    if favorites is None:
+        favorites = _cache_load(user_id)
+    return slug in favorites
+
+
+# --- Media Cache Functions ---
+# Telegram file_ids of uploaded media, so each file is uploaded only once.
+# Rows live in the video_cache table: videos are keyed by cocktail slug, other
+# media by a "<kind>:<name>" key (e.g. "photo:cocktail.jpg"); slugs never
+# contain a colon, so the two cannot collide.
+# The whole table (a few dozen rows) is kept in memory: init_db() preloads it,
+# lookups never touch SQLite and every change is written through to the
+# database (or the write-behind buffer).
+
+_media_cache: dict[str, str] = {}
+_media_cache_loaded = False
+_media_cache_lock = threading.Lock()
+
+
+def load_media_cache() -> None:
+    """(Re)load the video_cache table into memory."""
+    global _media_cache, _media_cache_loaded
+    rows = get_connection().execute("SELECT slug, file_id FROM video_cache").fetchall()
+    with _media_cache_lock:
+        _media_cache = dict(rows)
+        _media_cache_loaded = True
+
+
+def _write_media_file_id(key: str, file_id: str | None) -> None:
+    """Persist a file_id change; None deletes the row."""
+    if _flusher is not None:
+        with _pending_lock:
+            _pending_media[key] = file_id
+            _mark_pending()
+        return
+    with get_connection() as conn:
+        if file_id is None:
+            conn.execute("DELETE FROM video_cache WHERE slug = ?", (key,))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO video_cache (slug, file_id) VALUES (?, ?)",
+                (key, file_id)
+            )
+
+
+def save_media_file_id(key: str, file_id: str) -> None:
+    """Save Telegram file_id for a media key to enable instant re-sending."""
+    if not _media_cache_loaded:
+        load_media_cache()
+    _media_cache[key] = file_id
+    _write_media_file_id(key, file_id)
+
+
+def delete_media_file_id(key: str) -> None:
+    """Forget a file_id that Telegram rejected, so the next request uploads the file again."""
+    if not _media_cache_loaded:
+        load_media_cache()
+    if _media_cache.pop(key, None) is not None:
+        _write_media_file_id(key, None)
 
 
-# --- Video Cache Functions ---
+def get_media_file_id(key: str) -> str | None:
+    """Get cached Telegram file_id for a media key. Returns None if not cached."""
+    if not _media_cache_loaded:
+        load_media_cache()
+    return _media_cache.get(key)
+
 
 def save_video_file_id(slug: str, file_id: str) -> None:
     """Save Telegram file_id for a video to enable instant re-sending."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT OR REPLACE INTO video_cache (slug, file_id) VALUES (?, ?)",
-            (slug, file_id)
-        )
-        conn.commit()
+    save_media_file_id(slug, file_id)
+
+
+def delete_video_file_id(slug: str) -> None:
+    """Forget a video file_id that Telegram rejected."""
+    delete_media_file_id(slug)
 
 
 def get_video_file_id(slug: str) -> str | None:
     """Get cached Telegram file_id for a video. Returns None if not cached."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT file_id FROM video_cache WHERE slug = ?", (slug,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+    return get_media_file_id(slug)
@@ -0,0 +1,108 @@
+"""
+Async facade over database.py for use inside bot handlers.
+
+Every call is executed on a worker thread so disk I/O never blocks the asyncio
+event loop. Reads go to a small thread pool (WAL allows concurrent readers);
+writes are queued onto a single dedicated writer thread, so they are applied in
+submission order and never contend with each other for the SQLite write lock.
+
+The synchronous functions in database.py remain the API for scripts.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Set, TypeVar
+
+import database
+import metrics
+
+T = TypeVar("T")
+
+READ_WORKERS = 4
+
+_read_executor: ThreadPoolExecutor | None = None
+_write_executor: ThreadPoolExecutor | None = None
+
+
+def _executors() -> tuple[ThreadPoolExecutor, ThreadPoolExecutor]:
+    global _read_executor, _write_executor
+    if _read_executor is None:
+        _read_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="db-read")
+    if _write_executor is None:
+        _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+    return _read_executor, _write_executor
+
+
+async def _run_read(func: Callable[..., T], *args) -> T:
+    executor, _ = _executors()
+    loop = asyncio.get_running_loop()
+    with metrics.timed(metrics.DB_SECONDS, op=func.__name__):
+        return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+
+async def _run_write(func: Callable[..., T], *args) -> T:
+    _, executor = _executors()
+    loop = asyncio.get_running_loop()
+    with metrics.timed(metrics.DB_SECONDS, op=func.__name__):
+        return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+
+def shutdown() -> None:
+    """Wait for queued writes to finish, flush the write-behind buffer and close connections."""
+    global _read_executor, _write_executor
+    for executor in (_write_executor, _read_executor):
+        if executor is not None:
+            executor.shutdown(wait=True)
+    _read_executor = _write_executor = None
+    database.stop_write_behind()
+    database.close_connections()
+
+
+# --- Favorites ---
+
+async def is_favorite(user_id: int, slug: str) -> bool:
+    return await _run_read(database.is_favorite, user_id, slug)
+
+
+async def get_user_favorites(user_id: int) -> Set[str]:
+    return await _run_read(database.get_user_favorites, user_id)
+
+
+async def toggle_favorite(user_id: int, slug: str) -> bool:
+    return await _run_write(database.toggle_favorite, user_id, slug)
+
+
+async def add_favorite(user_id: int, slug: str) -> bool:
+    return await _run_write(database.add_favorite, user_id, slug)
+
+
+async def remove_favorite(user_id: int, slug: str) -> bool:
+    return await _run_write(database.remove_favorite, user_id, slug)
+
+
+# --- Media Cache ---
+
+async def get_media_file_id(key: str) -> str | None:
+    # Served from the in-memory copy preloaded by init_db(), no thread hop needed
+    return database.get_media_file_id(key)
+
+
+async def save_media_file_id(key: str, file_id: str) -> None:
+    await _run_write(database.save_media_file_id, key, file_id)
+
+
+async def delete_media_file_id(key: str) -> None:
+    await _run_write(database.delete_media_file_id, key)
+
+
+async def get_video_file_id(slug: str) -> str | None:
+    return database.get_video_file_id(slug)
+
+
+async def save_video_file_id(slug: str, file_id: str) -> None:
+    await save_media_file_id(slug, file_id)
+
+
+async def delete_video_file_id(slug: str) -> None:
+    await delete_media_file_id(slug)
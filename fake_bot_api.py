@@ -0,0 +1,263 @@
+"""
+Локальная заглушка Telegram Bot API для бенчмарков и проверок без сети.
+
+Отвечает на методы, которые использует бот (getMe, sendMessage, sendPhoto,
+sendVideo, editMessageText, editMessageMedia, answerCallbackQuery, setWebhook…),
+правдоподобными объектами, выдаёт file_id для загруженных файлов и записывает
+все вызовы в calls. getUpdates отдаёт апдейты из очереди updates (long polling);
+text_update и callback_update собирают апдейты от имени пользователя.
+
+    api = FakeBotApi(latency=0.02)
+    await api.start()
+    app = build_application("123:TEST", api.base_url)
+    ...
+    await api.stop()
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Any, Optional
+from urllib.parse import parse_qs
+
+FAKE_BOT = {"id": 100000, "is_bot": True, "first_name": "Cocktail Bot", "username": "fake_cocktail_bot"}
+
+# Методы, которые возвращают отправленное или изменённое сообщение
+_MESSAGE_METHODS = {
+    "sendMessage", "sendPhoto", "sendVideo",
+    "editMessageText", "editMessageMedia", "editMessageCaption", "editMessageReplyMarkup",
+}
+
+
+class FakeBotApi:
+    """HTTP-сервер на asyncio, изображающий api.telegram.org."""
+
+    def __init__(
+        self, latency: float = 0.0, upload_bytes_per_sec: float = 0.0, flood_every: int = 0
+    ) -> None:
+        self.latency = latency  # Задержка ответа на любой метод, секунды
+        self.upload_bytes_per_sec = upload_bytes_per_sec  # 0 — загрузка мгновенная
+        self.flood_every = flood_every  # Каждый N-й запрос с chat_id получает 429 RetryAfter
+        self.flood_retry_after = 1
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+        self.updates: asyncio.Queue[dict] = asyncio.Queue()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._ids = itertools.count(1)
+        self._chat_requests = 0
+        self.flooded = 0  # Сколько раз ответили 429
+        self.port = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def count(self, method: str) -> int:
+        return sum(1 for name, _ in self.calls if name == method)
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await self._read_body(reader, headers)
+
+                method = path.rstrip("/").rsplit("/", 1)[-1]
+                params = _parse_params(headers.get("content-type", ""), body)
+                status, response = await self._call(method, params, len(body))
+                payload = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n".encode()
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Сервер останавливают посреди long polling — просто закрываем соединение
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, headers: dict[str, str]) -> bytes:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).strip() or b"0", 16)
+                if size == 0:
+                    await reader.readline()
+                    return b"".join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+        length = int(headers.get("content-length", "0"))
+        return await reader.readexactly(length) if length else b""
+
+    # --- Методы Bot API ---
+
+    async def _call(self, method: str, params: dict[str, Any], body_size: int) -> tuple[str, dict]:
+        delay = self.latency
+        if self.upload_bytes_per_sec and body_size > 64 * 1024:
+            delay += body_size / self.upload_bytes_per_sec
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.flood_every and "chat_id" in params:
+            self._chat_requests += 1
+            if self._chat_requests % self.flood_every == 0:
+                self.flooded += 1
+                return "429 Too Many Requests", {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.flood_retry_after}",
+                    "parameters": {"retry_after": self.flood_retry_after},
+                }
+        self.calls.append((method, params))
+        return "200 OK", {"ok": True, "result": await self._result(method, params)}
+
+    async def _result(self, method: str, params: dict[str, Any]) -> Any:
+        if method == "getMe":
+            return FAKE_BOT
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method in _MESSAGE_METHODS:
+            return self._message(method, params)
+        return True
+
+    async def _get_updates(self, params: dict[str, Any]) -> list[dict]:
+        timeout = float(params.get("timeout") or 0)
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout) if timeout else self.updates.get_nowait())
+        except (asyncio.TimeoutError, asyncio.QueueEmpty):
+            return []
+        while not self.updates.empty() and len(batch) < int(params.get("limit") or 100):
+            batch.append(self.updates.get_nowait())
+        return batch
+
+    def _file(self, kind: str) -> dict:
+        n = next(self._ids)
+        return {"file_id": f"fake-{kind}-{n}", "file_unique_id": f"u{kind}{n}"}
+
+    def _message(self, method: str, params: dict[str, Any]) -> dict:
+        chat_id = params.get("chat_id") or 1
+        message = {
+            "message_id": params.get("message_id") or next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": FAKE_BOT,
+        }
+        kind = None
+        if method == "sendPhoto":
+            kind = "photo"
+        elif method == "sendVideo":
+            kind = "video"
+        elif method == "editMessageMedia":
+            media = params.get("media")
+            kind = media.get("type") if isinstance(media, dict) else None
+
+        if kind == "photo":
+            message["photo"] = [{**self._file("photo"), "width": 1280, "height": 720}]
+        elif kind == "video":
+            message["video"] = {**self._file("video"), "width": 720, "height": 1280, "duration": 30}
+        if "caption" in params:
+            message["caption"] = params["caption"]
+        if "text" in params:
+            message["text"] = params["text"]
+        return message
+
+
+def _user(chat_id: int) -> dict:
+    return {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"}
+
+
+def text_update(update_id: int, chat_id: int, text: str) -> dict:
+    """Апдейт с текстовым сообщением пользователя chat_id (команды размечаются как в Telegram)."""
+    user = _user(chat_id)
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"offset": 0, "length": len(text.split()[0]), "type": "bot_command"}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_update(update_id: int, chat_id: int, data: str, message_id: int = 1) -> dict:
+    """Апдейт с нажатием инлайн-кнопки data под сообщением бота message_id."""
+    user = _user(chat_id)
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "from": user,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+                "from": FAKE_BOT,
+                "text": "Выберите коктейль:",
+            },
+        },
+    }
+
+
+def _decode(value: str) -> Any:
+    """PTB кодирует сложные параметры в JSON; простые строки оставляем как есть."""
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _parse_params(content_type: str, body: bytes) -> dict[str, Any]:
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return {key: _decode(values[-1]) for key, values in parse_qs(body.decode()).items()}
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename() is None:
+                params[name] = _decode((part.get_payload(decode=True) or b"").decode("utf-8"))
+            else:
+                params[name] = f"<file {len(part.get_payload(decode=True) or b'')} bytes>"
+        return params
+    return {}
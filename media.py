@@ -0,0 +1,490 @@
+"""Источники медиа для рецептов: хранилище media_store, локальные файлы из папки video или URL."""
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Iterator, Optional, Union
+
+from telegram import Message
+from telegram.error import BadRequest, NetworkError
+
+import cocktails_data as data
+import db_async
+import media_store
+import metrics
+
+# Видео лежат в хранилище media_store/ (см. media_store.py); папка video —
+# запасной вариант для роликов, которые ещё не перенесены в хранилище
+VIDEOS_DIR = Path(__file__).parent / "video"
+
+
+def _video_name(value: Union[str, Path]) -> Optional[str]:
+    """Имя видео в хранилище; None — URL или абсолютный путь, хранилище их не знает."""
+    if isinstance(value, Path):
+        return None if value.is_absolute() else value.name
+    return None if value.startswith(("http://", "https://")) else value
+
+
+def resolve_video_source(slug: str) -> Optional[Union[str, Path]]:
+    """Находит источник видео: блоб из хранилища, локальный файл или URL."""
+    value = data.COCKTAIL_VIDEOS.get(slug)
+    if value is None:
+        return None
+
+    # URL — отдать как есть
+    if isinstance(value, str) and value.startswith(("http://", "https://")):
+        return value
+
+    # Ролик из хранилища: путь берётся из манифеста в памяти, диск не трогаем
+    name = _video_name(value)
+    if name is not None:
+        blob = media_store.store.resolve(name)
+        if blob is not None:
+            return blob
+
+    return legacy_video_path(slug)
+
+
+def legacy_video_path(slug: str) -> Optional[Path]:
+    """Локальный файл из папки /video рядом с проектом (или по абсолютному пути), если он есть."""
+    value = data.COCKTAIL_VIDEOS.get(slug)
+    if value is None or (isinstance(value, str) and value.startswith(("http://", "https://"))):
+        return None
+    if isinstance(value, Path):
+        candidate = value if value.is_absolute() else VIDEOS_DIR / value
+    else:
+        candidate = VIDEOS_DIR / str(value)
+
+    return candidate if candidate.exists() else None
+
+
+def video_size(source: Path) -> int:
+    """Размер файла: для блоба — из манифеста, без обращения к диску."""
+    blob = media_store.store.blobs.get(source.stem)
+    if blob is not None and source.parent.parent == media_store.store.blobs_dir:
+        return blob["size"]
+    return source.stat().st_size
+
+
+def video_cache_key(slug: str) -> str:
+    """
+    Ключ file_id в кэше медиа. Для роликов из хранилища — хэш отправляемого файла:
+    одинаковые файлы делят один file_id, а пережатый ролик получает новый ключ.
+    Для URL и файлов вне хранилища — сам слаг.
+    """
+    value = data.COCKTAIL_VIDEOS.get(slug)
+    name = _video_name(value) if value is not None else None
+    sha = media_store.store.served(name) if name is not None else None
+    return f"video:{sha}" if sha else slug
+
+
+# --- Метаданные видео ---
+# compress_videos.py записывает в манифест хранилища длительность, размеры и
+# превью каждого блоба. Они отправляются вместе с видео: клиенты Telegram сразу
+# знают размер плеера и показывают превью, а supports_streaming разрешает
+# смотреть видео, не дожидаясь полной загрузки.
+
+@contextmanager
+def open_video_upload(source: Path) -> Iterator[tuple[BinaryIO, dict]]:
+    """Открывает видео (и превью) для загрузки; отдаёт файл и параметры для send_video."""
+    store = media_store.store
+    meta = store.meta(source.stem)
+    attributes: dict = {"supports_streaming": True}
+    for name in ("duration", "width", "height"):
+        if meta.get(name):
+            attributes[name] = meta[name]
+    with ExitStack() as stack:
+        thumbnail = meta.get("thumbnail")
+        if thumbnail in store.blobs and store.blob_path(thumbnail).exists():
+            attributes["thumbnail"] = stack.enter_context(store.blob_path(thumbnail).open("rb"))
+        yield stack.enter_context(source.open("rb")), attributes
+
+
+# --- Single-flight загрузки ---
+# Пока видео загружается для одного пользователя, остальные запросы того же
+# видео (по ключу video_cache_key) не начинают свою загрузку, а ждут file_id
+# первой (не дольше дедлайна).
+
+UPLOAD_WAIT_TIMEOUT = 30.0  # Сколько ждать чужую загрузку, прежде чем ответить текстом
+
+_inflight_uploads: dict[str, asyncio.Future] = {}
+
+
+def inflight_upload(key: str) -> Optional[asyncio.Future]:
+    """Возвращает future загрузки видео, если она уже идёт."""
+    return _inflight_uploads.get(key)
+
+
+@contextmanager
+def lead_upload(key: str) -> Iterator[asyncio.Future]:
+    """
+    Регистрирует текущую задачу как единственного загрузчика видео.
+    Загрузчик кладёт file_id в future через set_result; если он этого не сделал
+    (ошибка, таймаут), ожидающие получат None.
+    """
+    flight = asyncio.get_running_loop().create_future()
+    _inflight_uploads[key] = flight
+    try:
+        yield flight
+    finally:
+        if not flight.done():
+            flight.set_result(None)
+        if _inflight_uploads.get(key) is flight:
+            del _inflight_uploads[key]
+
+
+async def wait_for_upload(flight: asyncio.Future, timeout: float = UPLOAD_WAIT_TIMEOUT) -> Optional[str]:
+    """Ждёт file_id чужой загрузки; None при ошибке загрузчика или по дедлайну."""
+    try:
+        return await asyncio.wait_for(asyncio.shield(flight), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+# --- Планировщик загрузок ---
+# Загрузки локальных файлов идут через общий планировщик: одновременно не больше
+# MAX_CONCURRENT_UPLOADS, при заданном UPLOAD_BYTES_PER_SEC средняя скорость
+# ограничивается. Текстовые ответы и правки клавиатур планировщик не трогают,
+# поэтому навигация по меню не ждёт чужих видео.
+
+MAX_CONCURRENT_UPLOADS = int(os.environ.get("MAX_CONCURRENT_UPLOADS", "2"))
+UPLOAD_BYTES_PER_SEC = int(os.environ.get("UPLOAD_BYTES_PER_SEC", "0"))  # 0 — без ограничения
+
+PRIORITY_USER = 0  # Пользователь ждёт ответа
+PRIORITY_BACKGROUND = 10  # Прогрев и прочие фоновые загрузки
+
+
+class UploadScheduler:
+    """Ограничивает число параллельных загрузок и их суммарную скорость, с приоритетами."""
+
+    def __init__(self, max_concurrent: int, bytes_per_sec: int = 0) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.bytes_per_sec = bytes_per_sec
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._next_start = 0.0
+        self._stats = {
+            "uploads": 0,
+            "bytes": 0,
+            "max_queue_depth": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    @asynccontextmanager
+    async def slot(self, size: int = 0, priority: int = PRIORITY_USER) -> AsyncIterator[None]:
+        """Ждёт свободного места для загрузки size байт и держит его до выхода из блока."""
+        queued_at = time.monotonic()
+        await self._acquire(priority)
+        try:
+            await self._pace(size)
+            waited = time.monotonic() - queued_at
+            self._stats["uploads"] += 1
+            self._stats["bytes"] += size
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int) -> None:
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._waiters))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Место уже передали нам — отдаём его следующему
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # Место переходит к ожидающему, счётчик активных не меняется
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def _pace(self, size: int) -> None:
+        """Растягивает старты загрузок так, чтобы в среднем не превышать bytes_per_sec."""
+        if self.bytes_per_sec <= 0 or size <= 0:
+            return
+        now = time.monotonic()
+        start_at = max(now, self._next_start)
+        self._next_start = start_at + size / self.bytes_per_sec
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    def stats(self) -> dict[str, float]:
+        """Метрики: текущая глубина очереди, активные загрузки, ожидание и объём."""
+        return {**self._stats, "queue_depth": len(self._waiters), "active": self._active}
+
+
+upload_scheduler = UploadScheduler(MAX_CONCURRENT_UPLOADS, UPLOAD_BYTES_PER_SEC)
+
+
+# --- Доставка видео ---
+# Единый путь доставки видео рецепта для ответа на нажатие и на текст:
+# file_id из кэша -> ожидание чужой загрузки -> загрузка файла или URL
+# (повторы с экспоненциальной задержкой и дедлайном на попытку) -> текст.
+# Если Telegram подряд не принимает видео, автомат отключает видео на время
+# и сразу отвечает текстом, не заставляя пользователей ждать таймаутов.
+
+MAX_UPLOAD_ATTEMPTS = 3
+BACKOFF_BASE = 1.0  # Секунды до второй попытки; дальше удваивается
+BACKOFF_MAX = 10.0
+FILE_ID_DEADLINE = 20.0  # Дедлайн отправки по file_id
+UPLOAD_DEADLINE = 120.0  # Дедлайн одной попытки загрузки файла
+BREAKER_FAILURE_THRESHOLD = 5  # Столько сбоев подряд открывают автомат
+BREAKER_RESET_TIMEOUT = 60.0  # Через столько секунд пробуем видео снова
+
+# Сбои, после которых есть смысл повторить попытку
+_RETRYABLE = (NetworkError, asyncio.TimeoutError)
+
+# Отправляет видео (file_id, URL или открытый файл) и возвращает сообщение или True.
+# При загрузке файла передаются ещё duration/width/height/thumbnail/supports_streaming.
+SendVideo = Callable[..., Awaitable[Union[Message, bool, None]]]
+# Отправляет рецепт текстом; аргумент — показать ли пометку, что видео недоступно
+SendText = Callable[[bool], Awaitable[object]]
+
+
+class CircuitBreaker:
+    """
+    Автомат: после threshold сбоев подряд запрещает попытки на reset_timeout секунд.
+    Затем пропускает ровно одну пробную доставку; пока она идёт, остальные получают
+    отказ. Успех пробы закрывает автомат, сбой снова открывает его.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe: Optional[asyncio.Task] = None  # Задача, которая сейчас проверяет Telegram
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != "half-open":
+            return state == "closed"
+        task = asyncio.current_task()
+        if self._probe is None:
+            self._probe = task
+        return self._probe is task
+
+    def end_probe(self) -> None:
+        """Снимает пробу текущей задачи, если она закончилась без успеха и сбоя (например, текстом)."""
+        if self._probe is not None and self._probe is asyncio.current_task():
+            self._probe = None
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.threshold:
+            self._opened_at = time.monotonic()
+            self._probe = None
+
+
+video_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+
+@dataclass
+class DeliveryReport:
+    """Как прошла доставка рецепта: итог, число попыток загрузки и время по этапам."""
+
+    slug: str
+    outcome: str = ""  # cached | shared | uploaded | text | text_fallback | breaker_open
+    attempts: int = 0
+    stages: dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+
+_delivery_stats: dict[str, dict[str, float]] = {}
+
+
+def _record_delivery(report: DeliveryReport) -> None:
+    outcome = _delivery_stats.setdefault(report.outcome, {"count": 0})
+    outcome["count"] += 1
+    for name, seconds in report.stages.items():
+        outcome[f"{name}_seconds_total"] = outcome.get(f"{name}_seconds_total", 0.0) + seconds
+        outcome[f"{name}_seconds_max"] = max(outcome.get(f"{name}_seconds_max", 0.0), seconds)
+
+
+def delivery_stats() -> dict[str, dict[str, float]]:
+    """Счётчики доставок по итогам и суммарное/максимальное время этапов."""
+    return {outcome: dict(values) for outcome, values in _delivery_stats.items()}
+
+
+def _backoff(attempt: int) -> float:
+    """Экспоненциальная задержка с «полным» джиттером."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def file_id_rejected(error: BadRequest) -> bool:
+    """
+    Отверг ли Telegram сам file_id. editMessageMedia отвечает BadRequest и на
+    ошибки, не связанные с файлом («message is not modified», «message can't be
+    edited»), — из-за них рабочий file_id забывать нельзя.
+    """
+    text = error.message.lower()
+    return "file identifier" in text or "file reference" in text or "file_reference" in text
+
+
+def message_not_modified(error: BadRequest) -> bool:
+    """Сообщение уже показывает то же самое (например, повторное нажатие кнопки)."""
+    return "message is not modified" in error.message.lower()
+
+
+async def _send_by_file_id(send_video: SendVideo, file_id: str) -> bool:
+    try:
+        result = await asyncio.wait_for(send_video(file_id), FILE_ID_DEADLINE)
+    except BadRequest:
+        raise
+    except _RETRYABLE:
+        video_breaker.record_failure()
+        return False
+    video_breaker.record_success()
+    return bool(result)
+
+
+async def deliver_video(slug: str, send_video: SendVideo, send_text: SendText) -> DeliveryReport:
+    """Доставляет рецепт с видео, если оно есть и Telegram его принимает, иначе текстом."""
+    report = DeliveryReport(slug)
+    try:
+        with report.stage("total"):
+            report.outcome = await _deliver(slug, send_video, send_text, report)
+    finally:
+        video_breaker.end_probe()
+    _record_delivery(report)
+    return report
+
+
+async def _deliver(slug: str, send_video: SendVideo, send_text: SendText, report: DeliveryReport) -> str:
+    if not video_breaker.allow():
+        with report.stage("fallback"):
+            await send_text(resolve_video_source(slug) is not None)
+        return "breaker_open"
+
+    key = video_cache_key(slug)
+    cached_file_id = await db_async.get_media_file_id(key)
+    if cached_file_id:
+        with report.stage("cached"):
+            try:
+                if await _send_by_file_id(send_video, cached_file_id):
+                    return "cached"
+            except BadRequest as e:
+                if message_not_modified(e):
+                    return "cached"
+                if not file_id_rejected(e):
+                    # Ошибка не про файл: загрузка упёрлась бы в неё же, file_id оставляем
+                    with report.stage("fallback"):
+                        await send_text(True)
+                    return "text_fallback"
+                # Telegram больше не принимает этот file_id — забываем его и загружаем заново
+                await db_async.delete_media_file_id(key)
+
+    source = resolve_video_source(slug)
+    if source is None:
+        with report.stage("fallback"):
+            await send_text(False)
+        return "text"
+
+    # Это видео уже загружается для другого пользователя — ждём его file_id
+    flight = inflight_upload(key)
+    if flight is not None:
+        with report.stage("wait"):
+            file_id = await wait_for_upload(flight)
+        if file_id:
+            with report.stage("cached"):
+                try:
+                    if await _send_by_file_id(send_video, file_id):
+                        return "shared"
+                except BadRequest as e:
+                    if message_not_modified(e):
+                        return "shared"
+        with report.stage("fallback"):
+            await send_text(True)
+        return "text_fallback"
+
+    with lead_upload(key) as flight:
+        for attempt in range(MAX_UPLOAD_ATTEMPTS):
+            if attempt:
+                with report.stage("backoff"):
+                    await asyncio.sleep(_backoff(attempt))
+            # Автомат мог открыться на отправке по file_id или на прошлой попытке
+            if not video_breaker.allow():
+                break
+            report.attempts += 1
+            try:
+                with report.stage("upload"):
+                    result = await _upload(source, send_video)
+            except BadRequest:
+                # Файл не подходит Telegram — повторять бессмысленно
+                break
+            except _RETRYABLE:
+                video_breaker.record_failure()
+                continue
+            except OSError:
+                # Блоба из манифеста нет на диске (хранилище синхронизировано не полностью
+                # или gc успел его удалить) — пробуем старый файл из папки video
+                legacy = legacy_video_path(slug)
+                if legacy is None or legacy == source:
+                    break
+                source = legacy
+                continue
+            video_breaker.record_success()
+            video = getattr(result, "video", None)
+            if video:
+                # Cache the file_id for future instant delivery
+                await db_async.save_media_file_id(key, video.file_id)
+                flight.set_result(video.file_id)
+            return "uploaded"
+
+    with report.stage("fallback"):
+        await send_text(True)
+    return "text_fallback"
+
+
+async def _upload(source: Union[str, Path], send_video: SendVideo) -> Union[Message, bool, None]:
+    if isinstance(source, Path):
+        size = video_size(source)
+        async with upload_scheduler.slot(size):
+            with open_video_upload(source) as (file_obj, attributes):
+                with metrics.timed(metrics.UPLOAD_SECONDS, source="file"):
+                    result = await asyncio.wait_for(send_video(file_obj, **attributes), UPLOAD_DEADLINE)
+        if metrics.enabled:
+            metrics.UPLOAD_BYTES.inc(size)
+        return result
+    with metrics.timed(metrics.UPLOAD_SECONDS, source="url"):
+        return await asyncio.wait_for(send_video(source, supports_streaming=True), UPLOAD_DEADLINE)
@@ -0,0 +1,228 @@
+"""
+Хранилище видео по содержимому.
+
+Каждый файл лежит в media_store/blobs/<2 первых символа хэша>/<sha256><расширение>,
+поэтому одинаковые файлы хранятся один раз. media_store/manifest.json связывает
+имя видео из каталога (negroni.mp4) с его вариантами — оригиналом и сжатой
+версией, которую бот отправляет в Telegram, — а для каждого блоба хранит размер
+и метаданные (длительность, размеры, битрейт, хэш превью).
+
+Бот читает манифест в память и находит файл по имени без обращений к диску.
+file_id в Telegram кэшируется по хэшу отправляемого блоба: после пережатия
+ролика ключ меняется, и старый file_id больше не используется.
+
+Файлы кладёт сюда compress_videos.py. Перенести уже имеющиеся video/ и
+video_backup/ (оригиналы) и удалить блобы, на которые нет ссылок:
+    python media_store.py import
+    python media_store.py gc
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+# Исправляем кодировку для Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+STORE_DIR = Path(os.environ.get("MEDIA_STORE_DIR", Path(__file__).parent / "media_store"))
+FORMAT_VERSION = 1
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaStore:
+    """
+    Блобы и манифест. videos: имя -> {"original", "compressed", "settings", ...};
+    blobs: sha256 -> {"size", "ext", "meta"}. Методы, меняющие манифест, можно
+    вызывать из нескольких потоков; на диск он пишется только через save().
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.blobs_dir = root / "blobs"
+        self.manifest_path = root / "manifest.json"
+        self.videos: dict[str, dict] = {}
+        self.blobs: dict[str, dict] = {}
+        self._signature: Optional[tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    # --- Манифест ---
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = self.manifest_path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> None:
+        signature = self._stat()
+        if signature is None:
+            self.videos, self.blobs = {}, {}
+        else:
+            with self.manifest_path.open(encoding="utf-8") as f:
+                document = json.load(f)
+            if document.get("version") != FORMAT_VERSION:
+                raise ValueError(f"{self.manifest_path}: неподдерживаемая версия {document.get('version')!r}")
+            self.videos, self.blobs = document["videos"], document["blobs"]
+        self._signature = signature
+
+    def reload_if_changed(self) -> bool:
+        """Перечитывает манифест, если его переписали (например, после compress_videos.py)."""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        # Битый манифест не перечитываем, пока его не перепишут
+        self._signature = signature
+        self.load()
+        return True
+
+    def save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            document = {"version": FORMAT_VERSION, "videos": self.videos, "blobs": self.blobs}
+            temp_path = self.manifest_path.with_suffix(".tmp")
+            with temp_path.open("w", encoding="utf-8") as f:
+                json.dump(document, f, ensure_ascii=False, indent=2, sort_keys=True)
+            temp_path.replace(self.manifest_path)
+        self._signature = self._stat()
+
+    # --- Блобы ---
+
+    def blob_path(self, sha: str) -> Path:
+        return self.blobs_dir / sha[:2] / f"{sha}{self.blobs[sha]['ext']}"
+
+    def put(self, path: Path, sha: Optional[str] = None) -> str:
+        """Кладёт копию файла в хранилище (если такого содержимого ещё нет) и возвращает хэш."""
+        sha = sha or file_sha256(path)
+        with self._lock:
+            known = sha in self.blobs
+            if not known:
+                self.blobs[sha] = {"size": path.stat().st_size, "ext": path.suffix.lower()}
+        target = self.blob_path(sha)
+        if known and target.exists():
+            return sha
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Копируем во временный файл рядом и переименовываем: блоб не бывает недописанным
+        fd, temp_name = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(path, temp_name)
+        os.replace(temp_name, target)
+        return sha
+
+    def set_meta(self, sha: str, meta: dict) -> None:
+        with self._lock:
+            self.blobs[sha]["meta"] = meta
+
+    def update_video(self, name: str, **fields) -> dict:
+        with self._lock:
+            entry = self.videos.setdefault(name, {})
+            entry.update(fields)
+            return dict(entry)
+
+    # --- Чтение для бота ---
+
+    def served(self, name: str) -> Optional[str]:
+        """Хэш варианта, который отправляется пользователям: сжатый, иначе оригинал."""
+        entry = self.videos.get(name)
+        if entry is None:
+            return None
+        return entry.get("compressed") or entry.get("original")
+
+    def resolve(self, name: str) -> Optional[Path]:
+        sha = self.served(name)
+        return self.blob_path(sha) if sha else None
+
+    def meta(self, sha: str) -> dict:
+        return self.blobs.get(sha, {}).get("meta", {})
+
+    # --- Обслуживание ---
+
+    def referenced(self) -> set[str]:
+        shas = set()
+        for entry in self.videos.values():
+            shas.update(sha for sha in (entry.get("original"), entry.get("compressed")) if sha)
+        for sha in list(shas):
+            thumbnail = self.meta(sha).get("thumbnail")
+            if thumbnail:
+                shas.add(thumbnail)
+        return shas
+
+    def gc(self) -> tuple[int, int]:
+        """Удаляет блобы без ссылок. Возвращает (число файлов, байт)."""
+        keep = self.referenced()
+        removed = freed = 0
+        for sha in [sha for sha in self.blobs if sha not in keep]:
+            path = self.blob_path(sha)
+            if path.exists():
+                freed += path.stat().st_size
+                path.unlink()
+                removed += 1
+            del self.blobs[sha]
+        return removed, freed
+
+    def import_legacy(self, video_dir: Path, backup_dir: Path) -> int:
+        """
+        Переносит video/ (отправляемые версии) и video_backup/ (оригиналы) в хранилище.
+        Настройки сжатия берутся из video/.compress_manifest.json, если он есть и ролик
+        уже с faststart; иначе они пустые, и compress_videos.py обработает ролик заново.
+        """
+        try:
+            with (video_dir / ".compress_manifest.json").open(encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            legacy = {}
+        imported = 0
+        for path in sorted(video_dir.glob("*.mp4")):
+            if path.name.endswith(".temp.mp4"):
+                continue
+            served = self.put(path)
+            backup = backup_dir / path.name
+            original = self.put(backup) if backup.exists() else served
+            record = legacy.get(path.name, {})
+            settings = record.get("settings") if record.get("faststart") and record.get("sha256") == served else None
+            self.update_video(
+                path.name,
+                original=original,
+                compressed=served if served != original else None,
+                settings=settings,
+            )
+            imported += 1
+        return imported
+
+
+store = MediaStore(STORE_DIR)
+store.load()
+
+
+def main() -> None:
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    here = Path(__file__).parent
+    if command == "import":
+        count = store.import_legacy(here / "video", here / "video_backup")
+        store.save()
+        size = sum(blob["size"] for blob in store.blobs.values())
+        print(f"[STORE] Перенесено видео: {count}, блобов: {len(store.blobs)}, {size / (1024 * 1024):.1f} MB")
+    elif command == "gc":
+        removed, freed = store.gc()
+        store.save()
+        print(f"[STORE] Удалено блобов: {removed}, освобождено {freed / (1024 * 1024):.1f} MB")
+    else:
+        raise SystemExit("Использование: python media_store.py import | gc")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Метрики бота: гистограммы задержек, счётчики и HTTP-эндпоинт в текстовом
+формате Prometheus.
+
+Метрики выключены, пока не задан METRICS_PORT (или не вызван enable()):
+тогда декоратор instrument и контекстный менеджер timed только проверяют
+флаг и ничего не записывают. Все наблюдения делаются из event loop, поэтому
+обходятся без блокировок.
+
+Готовую статистику других модулей (кэш избранного, очередь загрузок,
+ограничитель запросов, доставка видео) не дублируем, а подключаем через
+register_collector: её словари читаются в момент запроса /metrics.
+"""
+
+import asyncio
+import bisect
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))  # 0 — эндпоинт и метрики выключены
+PREFIX = "bot_"
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+enabled = METRICS_PORT > 0
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def enable(state: bool = True) -> None:
+    """Включает или выключает сбор метрик (например, в бенчмарках без эндпоинта)."""
+    global enabled
+    enabled = state
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: счётчики, сумма и число наблюдений по меткам."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series: dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            # Корзины по порядку границ, затем +Inf, сумма, число
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels((*labels, ('le', str(bound))))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {total}"
+            yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+class Counter:
+    """Монотонный счётчик по меткам."""
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._series: dict[Labels, float] = {}
+
+    def inc(self, value: float = 1, labels: Labels = ()) -> None:
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._series.items():
+            yield f"{self.name}{_format_labels(labels)} {value}"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+HANDLER_SECONDS = Histogram(PREFIX + "handler_seconds", "Время обработки апдейта обработчиком")
+HANDLER_ERRORS = Counter(PREFIX + "handler_errors_total", "Исключения в обработчиках")
+DB_SECONDS = Histogram(PREFIX + "db_seconds", "Время вызова БД, включая ожидание потока")
+UPLOAD_SECONDS = Histogram(PREFIX + "upload_seconds", "Длительность загрузки видео в Telegram")
+UPLOAD_BYTES = Counter(PREFIX + "upload_bytes_total", "Объём загруженных видео")
+CATALOGUE_RELOAD_SECONDS = Histogram(PREFIX + "catalogue_reload_seconds", "Время перезагрузки каталога")
+
+_metrics: list = [HANDLER_SECONDS, HANDLER_ERRORS, DB_SECONDS, UPLOAD_SECONDS, UPLOAD_BYTES, CATALOGUE_RELOAD_SECONDS]
+_collectors: dict[str, tuple[Callable[[], dict], Optional[str]]] = {}
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels: str) -> Iterator[None]:
+    """Замеряет время блока в гистограмму (если метрики включены)."""
+    if not enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, tuple(labels.items()))
+
+
+def instrument(handler: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Декоратор обработчика: время выполнения и число исключений с меткой handler."""
+    labels = (("handler", handler.__name__),)
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs) -> T:
+        if not enabled:
+            return await handler(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(labels=labels)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, labels)
+
+    return wrapper
+
+
+def register_collector(name: str, collect: Callable[[], dict], label: Optional[str] = None) -> None:
+    """
+    Подключает готовую статистику: collect() возвращает {поле: число}, а если задан
+    label — {значение метки: {поле: число}}. Поля выводятся как bot_<name>_<поле>.
+    """
+    _collectors[name] = (collect, label)
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus."""
+    lines: list[str] = []
+    for metric in _metrics:
+        lines.extend(metric.expose())
+    for name, (collect, label) in _collectors.items():
+        stats = collect()
+        series = stats.items() if label else [(None, stats)]
+        for label_value, fields in series:
+            labels = ((label, label_value),) if label else ()
+            for field, value in fields.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"{PREFIX}{name}_{field}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP-эндпоинт ---
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        # Заголовки не нужны, но их надо дочитать до пустой строки
+        while (await reader.readline()).strip():
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", render().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> asyncio.AbstractServer:
+    """Запускает эндпоинт GET /metrics в текущем event loop и включает сбор метрик."""
+    enable()
+    server = await asyncio.start_server(_serve, host, port)
+    print(f"Metrics endpoint: http://{host}:{port}/metrics")
+    return server
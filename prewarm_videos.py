@@ -0,0 +1,108 @@
+"""
+Прогрев видео: заранее загружает в Telegram все ролики без сохранённого file_id.
+
+Каждый локальный файл из COCKTAIL_VIDEOS, для которого нет строки в video_cache,
+один раз отправляется в служебный чат, а полученный file_id сохраняется в базе.
+Ролики из хранилища кэшируются по хэшу содержимого, поэтому одинаковые файлы
+разных коктейлей загружаются один раз.
+После этого пользователи получают видео по ссылке мгновенно, без загрузки.
+
+Использование:
+    TELEGRAM_BOT_TOKEN=... VIDEO_WARMUP_CHAT_ID=... python prewarm_videos.py
+
+Бот запускает этот же прогрев в фоне при старте, если задан VIDEO_WARMUP_CHAT_ID.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from telegram import Bot
+from telegram.error import TelegramError
+
+import cocktails_data as data
+import database
+import db_async
+import media
+from media import resolve_video_source, video_cache_key
+
+# Исправляем кодировку для Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+
+async def prewarm(bot: Bot, chat_id: int) -> dict[str, float]:
+    """
+    Загружает все некэшированные локальные видео в chat_id и сохраняет их file_id.
+    Возвращает время загрузки каждого слага в секундах.
+    """
+    timings: dict[str, float] = {}
+    pending = [slug for slug in data.COCKTAIL_VIDEOS if not await db_async.get_media_file_id(video_cache_key(slug))]
+    print(f"[WARMUP] Видео без file_id: {len(pending)}", flush=True)
+
+    started = time.perf_counter()
+    for slug in pending:
+        source = resolve_video_source(slug)
+        # URL Telegram скачает сам, прогревать имеет смысл только локальные файлы
+        if not isinstance(source, Path):
+            continue
+
+        # Пользователь (или прогрев другого слага с тем же файлом) уже загрузил
+        # или загружает это видео — второй загрузки не нужно
+        key = video_cache_key(slug)
+        if media.inflight_upload(key) is not None or await db_async.get_media_file_id(key):
+            continue
+
+        upload_started = time.perf_counter()
+        with media.lead_upload(key) as flight:
+            try:
+                async with media.upload_scheduler.slot(media.video_size(source), media.PRIORITY_BACKGROUND):
+                    with media.open_video_upload(source) as (file_obj, attributes):
+                        sent = await bot.send_video(
+                            chat_id, video=file_obj, disable_notification=True, write_timeout=120.0, **attributes
+                        )
+            except (TelegramError, OSError) as e:
+                # OSError — блоба из манифеста нет на диске
+                print(f"  [ERROR] {slug}: {e}", flush=True)
+                continue
+            timings[slug] = time.perf_counter() - upload_started
+
+            if sent.video:
+                await db_async.save_media_file_id(key, sent.video.file_id)
+                flight.set_result(sent.video.file_id)
+        size_mb = media.video_size(source) / (1024 * 1024)
+        print(f"  [OK] {slug}: {size_mb:.1f} MB за {timings[slug]:.1f} с", flush=True)
+
+        # file_id остаётся валидным и после удаления сообщения — не засоряем служебный чат
+        try:
+            await sent.delete()
+        except TelegramError:
+            pass
+
+    total = time.perf_counter() - started
+    print(f"[WARMUP] Загружено {len(timings)} видео за {total:.1f} с", flush=True)
+    return timings
+
+
+async def _main(token: str, chat_id: int) -> None:
+    database.init_db()
+    try:
+        async with Bot(token) as bot:
+            await prewarm(bot, chat_id)
+    finally:
+        db_async.shutdown()
+
+
+def main() -> None:
+    token = os.environ.get("TELEGRAM_BOT_TOKEN", "")
+    chat_id = os.environ.get("VIDEO_WARMUP_CHAT_ID", "")
+    if not token or not chat_id:
+        print("[ERROR] Задайте TELEGRAM_BOT_TOKEN и VIDEO_WARMUP_CHAT_ID")
+        return
+    asyncio.run(_main(token, int(chat_id)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Ограничение исходящих запросов к Bot API под лимиты Telegram.
+
+Каждый запрос с chat_id (отправка и правка сообщений) проходит через два
+«ведра с токенами»: общее для бота и отдельное для чата. Если Telegram всё же
+отвечает RetryAfter, запрос не теряется: соответствующее ведро ставится на паузу
+на указанное время, и запрос повторяется. Служебные методы (getUpdates,
+answerCallbackQuery и т. п.) лимитам не подвергаются.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+_LOGGER = logging.getLogger(__name__)
+
+GLOBAL_PER_SECOND = 30.0  # Telegram: не больше ~30 сообщений в секунду на бота
+PRIVATE_CHAT_PER_SECOND = 1.0  # ~1 сообщение в секунду в один чат, короткие всплески допустимы
+PRIVATE_CHAT_BURST = 3
+GROUP_CHAT_PER_SECOND = 20 / 60  # Группы: не больше 20 сообщений в минуту
+GROUP_CHAT_BURST = 3
+MAX_RETRIES = 3
+IDLE_BUCKETS_LIMIT = 10_000  # Сколько ведер чатов держать, прежде чем чистить простаивающие
+
+JSONResult = Union[bool, dict[str, Any], list[dict[str, Any]]]
+
+
+class TokenBucket:
+    """Ведро с токенами: rate токенов в секунду, не больше capacity про запас. Очередь FIFO."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены seconds секунд (после RetryAfter от Telegram)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    def idle(self) -> bool:
+        """Ведро полно и никого не ждёт — его можно выбросить без потери состояния."""
+        self._refill(time.monotonic())
+        return not self._lock.locked() and self._tokens >= self.capacity
+
+
+class TokenBucketRateLimiter(BaseRateLimiter[int]):
+    """Общий и по-чатовый лимит на исходящие запросы с повтором после RetryAfter."""
+
+    def __init__(
+        self,
+        global_per_second: float = GLOBAL_PER_SECOND,
+        max_retries: int = MAX_RETRIES,
+    ) -> None:
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_per_second, global_per_second)
+        self._chats: dict[Union[int, str], TokenBucket] = {}
+        self._stats = {
+            "requests": 0,
+            "delayed": 0,
+            "queue_delay_seconds_total": 0.0,
+            "queue_delay_seconds_max": 0.0,
+            "retry_after": 0,
+            "waiting": 0,
+        }
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= IDLE_BUCKETS_LIMIT:
+                self._chats = {key: b for key, b in self._chats.items() if not b.idle()}
+            # Отрицательный id или @username — группа или канал
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                bucket = TokenBucket(GROUP_CHAT_PER_SECOND, GROUP_CHAT_BURST)
+            else:
+                bucket = TokenBucket(PRIVATE_CHAT_PER_SECOND, PRIVATE_CHAT_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _wait_turn(self, chat_bucket: TokenBucket) -> None:
+        queued_at = time.monotonic()
+        self._stats["waiting"] += 1
+        try:
+            # Сначала своя очередь чата, потом общая: флудящий чат не держит общий токен
+            await chat_bucket.acquire()
+            await self._global.acquire()
+        finally:
+            self._stats["waiting"] -= 1
+        delay = time.monotonic() - queued_at
+        self._stats["requests"] += 1
+        self._stats["queue_delay_seconds_total"] += delay
+        self._stats["queue_delay_seconds_max"] = max(self._stats["queue_delay_seconds_max"], delay)
+        if delay > 0.001:
+            self._stats["delayed"] += 1
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> JSONResult:
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+        chat_bucket = self._chat_bucket(chat_id)
+
+        max_retries = rate_limit_args if rate_limit_args is not None else self.max_retries
+        for attempt in range(max_retries + 1):
+            await self._wait_turn(chat_bucket)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                self._stats["retry_after"] += 1
+                if attempt == max_retries:
+                    raise
+                retry = exc.retry_after
+                seconds = retry.total_seconds() if isinstance(retry, timedelta) else float(retry)
+                _LOGGER.info("RetryAfter %.1f s for %s in chat %s, rescheduling", seconds, endpoint, chat_id)
+                chat_bucket.pause(seconds + 0.1)
+        raise AssertionError("unreachable")
+
+    def stats(self) -> dict[str, float]:
+        """Метрики очереди: число запросов, задержанные, суммарная и максимальная задержка."""
+        return {**self._stats, "chats": len(self._chats)}
@@ -0,0 +1,202 @@
+"""
+Кэш отрисовки: статичные клавиатуры и подписи рецептов.
+
+Всё, что зависит только от каталога, строится один раз в build_render_cache()
+и переиспользуется во всех ответах. Объекты telegram неизменяемы, поэтому одну
+и ту же клавиатуру можно безопасно отдавать параллельным обработчикам.
+При изменении каталога достаточно снова вызвать build_render_cache() или
+собрать RenderCache для нового каталога и поставить его через set_render_cache().
+
+Списки показываются страницами по PAGE_SIZE кнопок, чтобы ответ оставался
+маленьким при любом размере каталога. Страница адресуется в callback_data
+номером («alc:~3»), страницы разделов каталога собраны заранее, а избранное
+и результаты поиска режутся на лету через paginate() — строится только
+показываемый срез.
+"""
+
+import os
+from typing import Optional, Sequence, TypeVar
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+import cocktails_data as data
+from catalogue import Catalogue
+
+FAV_ON_TEXT = "✅ В избранном"
+FAV_OFF_TEXT = "⭐ Добавить в избранное"
+BACK_TEXT = "← Назад"
+PREV_TEXT = "‹"
+NEXT_TEXT = "›"
+
+PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", "8"))  # Кнопок коктейлей на странице списка
+PAGE_MARK = "~"  # «prefix:~N» — страница N списка prefix; слаги с ~ не начинаются
+
+T = TypeVar("T")
+
+
+def format_cocktail_details(details: dict) -> str:
+    """Собирает красивое описание коктейля."""
+    parts = [
+        f"🍸 <b>{details['title']}</b>",
+        "",
+        "<b>Ингредиенты:</b>",
+        *[f"• {item}" for item in details["ingredients"]],
+        "",
+        f"<b>Метод:</b>\n{details['method']}",
+    ]
+    if details.get("garnish"):
+        parts.extend(["", f"<b>Украшение:</b>\n{details['garnish']}"])
+    if details.get("note"):
+        parts.extend(["", f"<b>Заметка:</b>\n{details['note']}"])
+
+    return "\n".join(parts).strip()
+
+
+# --- Страницы списков ---
+
+def page_callback(prefix: str, page: int) -> str:
+    return f"{prefix}:{PAGE_MARK}{page}"
+
+
+def parse_page(value: str) -> Optional[int]:
+    """Номер страницы из части callback_data после префикса («~3»); None — это не страница."""
+    if not value.startswith(PAGE_MARK):
+        return None
+    try:
+        return max(0, int(value[len(PAGE_MARK):]))
+    except ValueError:
+        return None
+
+
+def page_count(total: int, page_size: int = PAGE_SIZE) -> int:
+    return max(1, -(-total // page_size))
+
+
+def paginate(items: Sequence[T], page: int, page_size: int = PAGE_SIZE) -> tuple[Sequence[T], int, int]:
+    """Срез страницы: (элементы, номер страницы в допустимых пределах, всего страниц)."""
+    pages = page_count(len(items), page_size)
+    page = min(max(page, 0), pages - 1)
+    return items[page * page_size:(page + 1) * page_size], page, pages
+
+
+def page_keyboard(
+    buttons: Sequence[InlineKeyboardButton],
+    prefix: str,
+    page: int,
+    pages: int,
+    back_callback: str = data.MENU_BACK_CALLBACK,
+) -> InlineKeyboardMarkup:
+    """Кнопки страницы в столбик, под ними «‹ 2/5 ›» (если страниц больше одной) и «Назад»."""
+    rows = [(button,) for button in buttons]
+    if pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton(PREV_TEXT, callback_data=page_callback(prefix, page - 1)))
+        nav.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=data.NOOP_CALLBACK))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton(NEXT_TEXT, callback_data=page_callback(prefix, page + 1)))
+        rows.append(tuple(nav))
+    rows.append((InlineKeyboardButton(BACK_TEXT, callback_data=back_callback),))
+    return InlineKeyboardMarkup(rows)
+
+
+def _list_pages(prefix: str, cocktails: list[tuple[str, str]]) -> list[InlineKeyboardMarkup]:
+    pages = page_count(len(cocktails))
+    return [
+        page_keyboard(
+            [
+                InlineKeyboardButton(text=label, callback_data=f"{prefix}:{slug}")
+                for slug, label in paginate(cocktails, page)[0]
+            ],
+            prefix,
+            page,
+            pages,
+        )
+        for page in range(pages)
+    ]
+
+
+class RenderCache:
+    """Снимок всего, что отрисовывается из каталога."""
+
+    def __init__(self, catalogue: Optional[Catalogue] = None) -> None:
+        catalogue = catalogue or data.CATALOGUE
+        self.main_menu = ReplyKeyboardMarkup(data.CHOICES, one_time_keyboard=True, resize_keyboard=True)
+        self._list_pages = {
+            data.ALCOHOL_PREFIX: _list_pages(data.ALCOHOL_PREFIX, catalogue.alcoholic),
+            data.NON_ALCOHOL_PREFIX: _list_pages(data.NON_ALCOHOL_PREFIX, catalogue.non_alcoholic),
+        }
+        # Куда вернуться из рецепта: на ту страницу раздела, где стоит коктейль
+        self._list_back = {
+            slug: page_callback(prefix, position // PAGE_SIZE)
+            for prefix, cocktails in (
+                (data.ALCOHOL_PREFIX, catalogue.alcoholic),
+                (data.NON_ALCOHOL_PREFIX, catalogue.non_alcoholic),
+            )
+            for position, (slug, _) in enumerate(cocktails)
+        }
+        # Порядок каталога: в нём показываются избранное и результаты поиска
+        self.order = {slug: position for position, slug in enumerate(catalogue.details)}
+        self.captions = {slug: format_cocktail_details(details) for slug, details in catalogue.details.items()}
+        # Заготовки строк клавиатуры рецепта: кнопка избранного в двух вариантах и кнопки «Назад»
+        self._fav_rows = {
+            slug: {
+                True: (InlineKeyboardButton(FAV_ON_TEXT, callback_data=f"{data.FAV_ADD_PREFIX}:{slug}"),),
+                False: (InlineKeyboardButton(FAV_OFF_TEXT, callback_data=f"{data.FAV_ADD_PREFIX}:{slug}"),),
+            }
+            for slug in catalogue.details
+        }
+        self._back_rows: dict[str, tuple[InlineKeyboardButton, ...]] = {}
+        self._recipe_keyboards: dict[tuple[str, bool, str], InlineKeyboardMarkup] = {}
+
+    def list_page(self, prefix: str, page: int = 0) -> InlineKeyboardMarkup:
+        """Готовая страница раздела; номер за пределами — ближайшая существующая."""
+        pages = self._list_pages[prefix]
+        return pages[min(max(page, 0), len(pages) - 1)]
+
+    def list_back_callback(self, slug: str, default: str) -> str:
+        return self._list_back.get(slug, default)
+
+    def recipe_keyboard(self, slug: str, is_fav: bool, back_callback: str) -> InlineKeyboardMarkup:
+        key = (slug, is_fav, back_callback)
+        keyboard = self._recipe_keyboards.get(key)
+        if keyboard is None:
+            fav_row = self._fav_rows.get(slug, {}).get(is_fav)
+            if fav_row is None:
+                text = FAV_ON_TEXT if is_fav else FAV_OFF_TEXT
+                fav_row = (InlineKeyboardButton(text, callback_data=f"{data.FAV_ADD_PREFIX}:{slug}"),)
+            back_row = self._back_rows.get(back_callback)
+            if back_row is None:
+                back_row = self._back_rows[back_callback] = (
+                    InlineKeyboardButton(BACK_TEXT, callback_data=back_callback),
+                )
+            keyboard = self._recipe_keyboards[key] = InlineKeyboardMarkup((fav_row, back_row))
+        return keyboard
+
+
+_cache: Optional[RenderCache] = None
+
+
+def build_render_cache() -> RenderCache:
+    """(Пере)строит кэш из текущего каталога."""
+    return set_render_cache(RenderCache())
+
+
+def set_render_cache(cache: RenderCache) -> RenderCache:
+    global _cache
+    _cache = cache
+    return _cache
+
+
+def get_render_cache() -> RenderCache:
+    if _cache is None:
+        return build_render_cache()
+    return _cache
+
+
+def cocktail_caption(slug: str, details: dict) -> str:
+    """Подпись рецепта из кэша; для коктейлей вне каталога собирается на лету."""
+    caption = get_render_cache().captions.get(slug)
+    if caption is None:
+        caption = format_cocktail_details(details)
+    return caption
@@ -0,0 +1,232 @@
+"""Поиск коктейлей по названию и по ингредиентам."""
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import cocktails_data as data
+from catalogue import Catalogue
+
+NAME_TO_SLUG: dict[str, str] = {}
+
+
+def _normalize_name(text: str) -> str:
+    return text.strip().lower()
+
+
+def _register_name(names: dict[str, str], name: str, slug: str) -> None:
+    if not name:
+        return
+    names.setdefault(_normalize_name(name), slug)
+
+
+@dataclass(frozen=True)
+class SearchIndex:
+    """Все индексы поиска по одному снимку каталога."""
+
+    names: dict[str, str]
+    ingredients: "IngredientIndex"
+    fuzzy: "FuzzyNameIndex"
+
+
+def compile_search_index(catalogue: Catalogue) -> SearchIndex:
+    """Строит индекс имен/синонимов, ингредиентов и нечёткий индекс; глобальное состояние не трогает."""
+    names: dict[str, str] = {}
+    for slug, label in catalogue.alcoholic + catalogue.non_alcoholic:
+        _register_name(names, label, slug)
+        _register_name(names, slug.replace("_", " "), slug)
+    for slug, details in catalogue.details.items():
+        _register_name(names, details.get("title", ""), slug)
+    # Быстрые клавиатурные варианты
+    _register_name(names, "1", " ")
+    return SearchIndex(names, IngredientIndex(catalogue.details), FuzzyNameIndex(names))
+
+
+def set_search_index(index: SearchIndex) -> None:
+    """Делает index текущим (одной заменой ссылок, без await)."""
+    global NAME_TO_SLUG, _ingredient_index, _fuzzy_index
+    NAME_TO_SLUG, _ingredient_index, _fuzzy_index = index.names, index.ingredients, index.fuzzy
+
+
+def build_name_index() -> None:
+    """Строит индексы поиска по текущему каталогу и делает их текущими."""
+    set_search_index(compile_search_index(data.CATALOGUE))
+
+
+def find_cocktail_slug(user_input: str) -> Optional[str]:
+    """Ищет слаг по названию: точно, затем без учёта пунктуации, ё и алфавита (негрони = negroni)."""
+    if not user_input:
+        return None
+    if not NAME_TO_SLUG:
+        build_name_index()
+    slug = NAME_TO_SLUG.get(_normalize_name(user_input))
+    if slug is None:
+        slug = _fuzzy_index.exact(user_input)
+    return slug
+
+
+def find_similar_cocktails(user_input: str, limit: int = 5) -> list[tuple[str, float]]:
+    """Возвращает похожие по названию коктейли: [(slug, сходство 0..1)], лучшие первыми."""
+    if not user_input:
+        return []
+    if not NAME_TO_SLUG:
+        build_name_index()
+    return _fuzzy_index.similar(user_input, limit)
+
+
+# --- Нечёткий поиск по названию ---
+
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+})
+# Сближаем латинские написания с транслитом: cosmopolitan ~ космополитан.
+# Применяется вторым проходом, уже к результату транслитерации: «чай» и «chai» сходятся
+_LATIN_FOLD = str.maketrans({"c": "k", "q": "k", "w": "v", "y": "i"})
+_NON_WORD = re.compile(r"[^\w]+")
+
+FUZZY_MIN_SCORE = 0.35  # Ниже этого сходства кандидаты не возвращаются
+FUZZY_ACCEPT_SCORE = 0.75  # С таким сходством единственный лидер показывается сразу
+
+
+def fuzzy_key(text: str) -> str:
+    """Приводит название к латинице без пунктуации: «Маргарита!» -> «margarita»."""
+    words = _NON_WORD.sub(" ", text.lower().replace("_", " ")).split()
+    return " ".join(words).translate(_TRANSLIT).translate(_LATIN_FOLD)
+
+
+def _trigrams(key: str) -> set[str]:
+    # Пробелы по краям дают вес началу и концу слова
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyNameIndex:
+    """
+    Триграммный индекс названий для поиска с опечатками.
+
+    Названия приводятся к общей латинской форме (fuzzy_key), поэтому кириллица
+    и латиница сходятся. Кандидаты набираются по общим триграммам через
+    инвертированный индекс и ранжируются по коэффициенту Дайса.
+    """
+
+    def __init__(self, names: dict[str, str]) -> None:
+        self._keys: list[str] = []
+        self._key_slugs: list[str] = []
+        self._sizes: list[int] = []
+        self._postings: dict[str, list[int]] = {}
+        self._exact: dict[str, str] = {}
+
+        for name, slug in names.items():
+            key = fuzzy_key(name)
+            if not key or key in self._exact:
+                continue
+            self._exact[key] = slug
+            key_id = len(self._keys)
+            self._keys.append(key)
+            self._key_slugs.append(slug)
+            grams = _trigrams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key_id)
+
+    def exact(self, text: str) -> Optional[str]:
+        """Точное совпадение после нормализации и транслитерации."""
+        return self._exact.get(fuzzy_key(text))
+
+    def similar(self, text: str, limit: int = 5) -> list[tuple[str, float]]:
+        key = fuzzy_key(text)
+        if not key:
+            return []
+        grams = _trigrams(key)
+        shared: Counter[int] = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        best: dict[str, float] = {}
+        for key_id, common in shared.items():
+            score = 2 * common / (len(grams) + self._sizes[key_id])
+            slug = self._key_slugs[key_id]
+            if score >= FUZZY_MIN_SCORE and score > best.get(slug, 0.0):
+                best[slug] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+
+# --- Индекс ингредиентов ---
+
+NGRAM = 3
+
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class IngredientIndex:
+    """
+    Инвертированный индекс триграмм по ингредиентам.
+
+    Одинаковые строки ингредиентов (после приведения к нижнему регистру) хранятся
+    один раз. Для запроса из трёх и более символов пересекаются списки строк по
+    его триграммам, начиная с самого короткого, и только кандидаты проверяются
+    на вхождение подстроки. Более короткие запросы проверяются по списку
+    уникальных строк — это всё равно быстрее, чем обход всех рецептов.
+    """
+
+    def __init__(self, details: dict[str, dict]) -> None:
+        self._texts: list[str] = []
+        self._text_slugs: list[list[int]] = []
+        self._postings: dict[str, set[int]] = {}
+        self._slugs: list[tuple[str, str]] = []
+
+        text_ids: dict[str, int] = {}
+        for slug_id, (slug, item) in enumerate(details.items()):
+            self._slugs.append((slug, item["title"]))
+            for ingredient in item.get("ingredients", []):
+                text = ingredient.lower()
+                text_id = text_ids.get(text)
+                if text_id is None:
+                    text_id = text_ids[text] = len(self._texts)
+                    self._texts.append(text)
+                    self._text_slugs.append([])
+                    for gram in _ngrams(text):
+                        self._postings.setdefault(gram, set()).add(text_id)
+                slugs = self._text_slugs[text_id]
+                if not slugs or slugs[-1] != slug_id:
+                    slugs.append(slug_id)
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        if len(query) < NGRAM:
+            return range(len(self._texts))
+        postings = []
+        for gram in _ngrams(query):
+            posting = self._postings.get(gram)
+            if not posting:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        return set.intersection(*postings)
+
+    def search(self, query: str) -> list[tuple[str, str]]:
+        """Возвращает (slug, title) коктейлей, в ингредиентах которых есть query, в порядке каталога."""
+        query = query.lower()
+        slug_ids: set[int] = set()
+        for text_id in self._candidates(query):
+            if query in self._texts[text_id]:
+                slug_ids.update(self._text_slugs[text_id])
+        return [self._slugs[i] for i in sorted(slug_ids)]
+
+
+_ingredient_index: Optional[IngredientIndex] = None
+_fuzzy_index: Optional[FuzzyNameIndex] = None
+
+
+def search_by_ingredient(query: str) -> list[tuple[str, str]]:
+    """Ищет коктейли, содержащие ингредиент. Возвращает список (slug, title)."""
+    if _ingredient_index is None:
+        build_name_index()
+    return _ingredient_index.search(query)
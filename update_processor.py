@@ -0,0 +1,63 @@
+"""
+Параллельная обработка апдейтов с сохранением порядка внутри чата.
+
+Апдейты разных чатов обрабатываются одновременно (не больше max_concurrent),
+а апдейты одного чата — строго по очереди, в порядке поступления: медленная
+загрузка видео одному пользователю больше не задерживает остальных, но его
+собственные нажатия не обгоняют друг друга.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Hashable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Сколько апдейтов может одновременно ждать своей очереди (включая ожидающих свой чат)
+MAX_PENDING_UPDATES = 4096
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Ограничивает общий параллелизм и сериализует апдейты каждого чата."""
+
+    def __init__(self, max_concurrent: int) -> None:
+        # Семафор базового класса ограничивает только число ждущих апдейтов: если бы
+        # он ограничивал выполнение, апдейты, стоящие в очереди своего чата, занимали
+        # бы места и могли бы заблокировать другие чаты.
+        super().__init__(MAX_PENDING_UPDATES)
+        self.max_concurrent = max(1, max_concurrent)
+        self._running = asyncio.Semaphore(self.max_concurrent)
+        self._chat_locks: dict[Hashable, asyncio.Lock] = {}
+        self._chat_waiters: dict[Hashable, int] = {}
+
+    @staticmethod
+    def _chat_key(update: object) -> Hashable:
+        if isinstance(update, Update):
+            if update.effective_chat is not None:
+                return update.effective_chat.id
+            if update.effective_user is not None:
+                return ("user", update.effective_user.id)
+        # Апдейты без чата (например, inline-запросы) не упорядочиваем
+        return ("update", id(update))
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._chat_key(update)
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        self._chat_waiters[key] = self._chat_waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._running:
+                    await coroutine
+        finally:
+            self._chat_waiters[key] -= 1
+            if not self._chat_waiters[key]:
+                del self._chat_waiters[key]
+                del self._chat_locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass